@@ -1,9 +1,12 @@
 # stock_app.py
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime
+from memory_budget import usage_panel
+from resilience import UpstreamError, fetch_history, fetch_info
+from summary_stats import summarize
+from symbol_index import check_symbol, symbol_input
 
 st.markdown(
     """
@@ -28,12 +31,14 @@ st.markdown(or: yellow;
     """, unsafe_allow_html=True
 )
 
+usage_panel()
+
 # Set title and description
 st.title("Stock Information Web App")
 st.write("Enter a ticker symbol to retrieve and visualize stock information interactively.")
 
 # Get the ticker symbol input
-ticker_symbol = st.text_input("Enter stock ticker (e.g., AAPL, MSFT):", "AAPL")
+ticker_symbol = symbol_input("Enter stock ticker (e.g., AAPL, MSFT):", "AAPL", key="ticker")
 
 # Date input for custom date range
 start_date = st.date_input("Start Date", value=datetime(2022, 1, 1))
@@ -44,87 +49,95 @@ if start_date > end_date:
     st.error("End date must be after the start date. Please adjust your dates.")
 else:
     if ticker_symbol:
+        # Unknown symbols are rejected by the full local index before any network call
+        if check_symbol(ticker_symbol) is None:
+            st.stop()
+
+        # Get company information; degrades to N/A fields if unavailable
+        info = fetch_info(ticker_symbol)
+
+        # Display basic information
+        st.subheader("Company Information")
+        st.write(f"**Name**: {info.get('longName', 'N/A')}")
+        st.write(f"**Sector**: {info.get('sector', 'N/A')}")
+        st.write(f"**Industry**: {info.get('industry', 'N/A')}")
+        st.write(f"**Country**: {info.get('country', 'N/A')}")
+
+        # Display current stock price
+        st.subheader("Stock Price")
+        st.write(f"**Current Price**: ${info.get('currentPrice', 'N/A')}")
+        st.write(f"**Market Cap**: ${info.get('marketCap', 'N/A')}")
+        st.write(f"**PE Ratio**: {info.get('trailingPE', 'N/A')}")
+
+        # Fetch historical data within selected date range
+        st.subheader("Historical Data")
+
+        # Select interval for data
+        interval = st.selectbox("Select Interval", ["1d", "5d", "1wk", "1mo", "3mo"])
         try:
-            # Get stock data from yfinance
-            stock = yf.Ticker(ticker_symbol)
-
-            # Display basic information
-            st.subheader("Company Information")
-            info = stock.info
-            st.write(f"**Name**: {info.get('longName', 'N/A')}")
-            st.write(f"**Sector**: {info.get('sector', 'N/A')}")
-            st.write(f"**Industry**: {info.get('industry', 'N/A')}")
-            st.write(f"**Country**: {info.get('country', 'N/A')}")
-
-            # Display current stock price
-            st.subheader("Stock Price")
-            st.write(f"**Current Price**: ${info.get('currentPrice', 'N/A')}")
-            st.write(f"**Market Cap**: ${info.get('marketCap', 'N/A')}")
-            st.write(f"**PE Ratio**: {info.get('trailingPE', 'N/A')}")
-
-            # Fetch historical data within selected date range
-            st.subheader("Historical Data")
-
-            # Select interval for data
-            interval = st.selectbox("Select Interval", ["1d", "5d", "1wk", "1mo", "3mo"])
-            data = stock.history(start=start_date, end=end_date, interval=interval)
-            st.write(data.tail())
-
-            # Option to display moving averages
-            show_moving_average = st.checkbox("Show Moving Averages")
-            if show_moving_average:
-                # Allow user to select two different moving average periods
-                short_ma_period = st.slider("Select Short-Term Moving Average Period (days)", 5, 50, 20)
-                long_ma_period = st.slider("Select Long-Term Moving Average Period (days)", 50, 200, 100)
-
-                # Calculate short-term and long-term moving averages
-                data[f"SMA_{short_ma_period}"] = data['Close'].rolling(short_ma_period).mean()
-                data[f"SMA_{long_ma_period}"] = data['Close'].rolling(long_ma_period).mean()
-
-            # Option to select chart type
-            chart_type = st.radio("Select Chart Type", ["Line Chart", "Candlestick Chart"])
-
-            # Display the selected chart
-            if chart_type == "Line Chart":
-                st.subheader("Stock Price Over Time - Line Chart")
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name="Close Price"))
-
-                # Add short-term and long-term moving averages to the line chart if enabled
-                if show_moving_average:
-                    fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{short_ma_period}"],
-                                             mode='lines', name=f"SMA {short_ma_period}"))
-                    fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{long_ma_period}"],
-                                             mode='lines', name=f"SMA {long_ma_period}"))
-
-                fig.update_layout(title=f"{ticker_symbol} Closing Prices",
-                                  xaxis_title="Date", yaxis_title="Price (USD)")
-                st.plotly_chart(fig)
-
-            elif chart_type == "Candlestick Chart":
-                st.subheader("Stock Price Over Time - Candlestick Chart")
-                fig = go.Figure(data=[go.Candlestick(
-                    x=data.index,
-                    open=data['Open'],
-                    high=data['High'],
-                    low=data['Low'],
-                    close=data['Close'],
-                )])
-
-                # Add short-term and long-term moving averages to the candlestick chart if enabled
-                if show_moving_average:
-                    fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{short_ma_period}"],
-                                             mode='lines', name=f"SMA {short_ma_period}"))
-                    fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{long_ma_period}"],
-                                             mode='lines', name=f"SMA {long_ma_period}"))
-
-                fig.update_layout(
-                    title=f"Candlestick chart for {ticker_symbol}",
-                    xaxis_title="Date",
-                    yaxis_title="Price (USD)",
-                    xaxis_rangeslider_visible=False
-                )
-                st.plotly_chart(fig)
-
-        except Exception as e:
+            # Copied, since moving-average columns are added below and the
+            # cached frame may be shared with other sessions
+            data = fetch_history(ticker_symbol, start=start_date, end=end_date, interval=interval).copy()
+        except UpstreamError as e:
             st.error(f"Could not retrieve data for {ticker_symbol}. Error: {e}")
+            st.stop()
+        st.write(data.tail())
+
+        # Option to display moving averages
+        show_moving_average = st.checkbox("Show Moving Averages", key="show_ma")
+        if show_moving_average:
+            # Allow user to select two different moving average periods
+            short_ma_period = st.slider("Select Short-Term Moving Average Period (days)", 5, 50, 20)
+            long_ma_period = st.slider("Select Long-Term Moving Average Period (days)", 50, 200, 100)
+
+            # Calculate short-term and long-term moving averages; only rows
+            # added since the last rerun are folded into the running windows
+            summary = summarize((ticker_symbol, start_date, end_date, interval), data)
+            data[f"SMA_{short_ma_period}"] = summary.rolling_mean(data, short_ma_period)
+            data[f"SMA_{long_ma_period}"] = summary.rolling_mean(data, long_ma_period)
+
+        # Option to select chart type
+        chart_type = st.radio("Select Chart Type", ["Line Chart", "Candlestick Chart"], key="chart_type")
+
+        # Display the selected chart
+        if chart_type == "Line Chart":
+            st.subheader("Stock Price Over Time - Line Chart")
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name="Close Price"))
+
+            # Add short-term and long-term moving averages to the line chart if enabled
+            if show_moving_average:
+                fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{short_ma_period}"],
+                                         mode='lines', name=f"SMA {short_ma_period}"))
+                fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{long_ma_period}"],
+                                         mode='lines', name=f"SMA {long_ma_period}"))
+
+            fig.update_layout(title=f"{ticker_symbol} Closing Prices",
+                              xaxis_title="Date", yaxis_title="Price (USD)")
+            st.plotly_chart(fig)
+
+        elif chart_type == "Candlestick Chart":
+            st.subheader("Stock Price Over Time - Candlestick Chart")
+            fig = go.Figure(data=[go.Candlestick(
+                x=data.index,
+                open=data['Open'],
+                high=data['High'],
+                low=data['Low'],
+                close=data['Close'],
+            )])
+
+            # Add short-term and long-term moving averages to the candlestick chart if enabled
+            if show_moving_average:
+                fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{short_ma_period}"],
+                                         mode='lines', name=f"SMA {short_ma_period}"))
+                fig.add_trace(go.Scatter(x=data.index, y=data[f"SMA_{long_ma_period}"],
+                                         mode='lines', name=f"SMA {long_ma_period}"))
+
+            fig.update_layout(
+                title=f"Candlestick chart for {ticker_symbol}",
+                xaxis_title="Date",
+                yaxis_title="Price (USD)",
+                xaxis_rangeslider_visible=False
+            )
+            st.plotly_chart(fig)
+
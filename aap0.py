@@ -1,42 +1,59 @@
 import streamlit as st
-import yfinance as yf
 import datetime
 import plotly.graph_objs as go
 from bs4 import BeautifulSoup
-import requests
+from currency import DISPLAY_CURRENCIES, currency_of, latest_rate, load_converter
+from market_hours import auto_refresh
+from memory_budget import usage_panel
+from resilience import UpstreamError, fetch_history, fetch_info, fetch_url, last_close, section
+from summary_stats import summarize
+from symbol_index import check_symbol, lookup, symbol_input
 
 # Set up the page configuration and title
 st.set_page_config(layout="wide", page_title="Market Overview and Stock Analysis")
 
 # Sidebar for stock selection and date range
 st.sidebar.title("Input Ticker")
-symbol = st.sidebar.text_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA').upper()
+symbol = symbol_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA', st.sidebar)
+symbol_record = check_symbol(symbol, st.sidebar)
 sdate = st.sidebar.date_input('Start Date', value=datetime.date(2024, 1, 1))
 edate = st.sidebar.date_input('End Date', value=datetime.date.today())
+display_currency = st.sidebar.selectbox('Display Currency', DISPLAY_CURRENCIES)
+
+# One batched FX fetch serves every currency conversion on the page
+money, fx = load_converter(display_currency, sdate)
 
 # Main title
 st.title(f"{symbol} Stock Analysis")
 
-# Fetch the stock data
-stock = yf.Ticker(symbol)
-data = stock.history(start=sdate, end=edate)
+# Fetch the stock data; unknown symbols are stopped by the full local index
+data = None
+if symbol_record is not None:
+    try:
+        data = fetch_history(symbol, start=sdate, end=edate)
+    except UpstreamError:
+        pass
 
 # Display stock details if data is available
-if not data.empty:
+if data is not None:
     # Company information
+    info = fetch_info(symbol)
     st.subheader(f"Company Information for {symbol}")
-    st.write(f"**Sector**: {stock.info.get('sector', 'N/A')}")
-    st.write(f"**Beta**: {stock.info.get('beta', 'N/A')}")
+    st.write(f"**Sector**: {info.get('sector', 'N/A')}")
+    st.write(f"**Beta**: {info.get('beta', 'N/A')}")
     
     # Stock data overview
     st.subheader("Stock Data Summary")
-    st.write(data.describe())
+    summary = summarize((symbol, sdate, edate), data)
+    st.write(summary.describe())
+    st.write(summary.performance())
 
     # Plot Closing Price chart
     st.subheader("Closing Price Over Time")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name="Close Price"))
-    fig.update_layout(xaxis_title="Date", yaxis_title="Closing Price (USD)")
+    close, close_currency = money.series(data['Close'], symbol_record["currency"])
+    fig.add_trace(go.Scatter(x=data.index, y=close, mode='lines', name="Close Price"))
+    fig.update_layout(xaxis_title="Date", yaxis_title=f"Closing Price ({close_currency})")
     st.plotly_chart(fig)
 else:
     st.error("Failed to fetch historical data for this stock.")
@@ -54,49 +71,64 @@ indices = {
     "Hang Seng": "^HSI"
 }
 
-index_data = {}
-for name, symbol in indices.items():
-    index = yf.Ticker(symbol)
-    index_info = index.history(period="1d")
-    index_data[name] = index_info["Close"][-1]
+def show_indices():
+    index_data = {}
+    for name, symbol in indices.items():
+        index_data[name] = last_close(symbol)
+
+    # Display indices in a column format, with exchange and currency from the
+    # local symbol index
+    for name, price in index_data.items():
+        listing = lookup(indices[name])
+        listing_help = f"{listing['exchange']}, quoted in {listing['currency']}" if listing else None
+        st.metric(label=name, value=money.format(price, currency_of(indices[name])), help=listing_help)
 
-# Display indices in a column format
-for name, price in index_data.items():
-    st.metric(label=name, value=f"${price:.2f}")
+# Refresh the tiles every minute while any of these markets trades, and
+# otherwise not until the next one opens
+auto_refresh(indices.values(), show_indices)
 
 # Currency Exchange Rates
 st.subheader("Currency Exchange Rates")
 currencies = ["USDJPY=X", "EURUSD=X", "GBPUSD=X"]
 currency_data = {}
 for currency in currencies:
-    currency_ticker = yf.Ticker(currency)
-    currency_info = currency_ticker.history(period="1d")
-    currency_data[currency] = currency_info["Close"][-1]
+    currency_data[currency] = latest_rate(fx, currency)
 
+# Exchange rates are ratios, not prices, so they carry no currency sign
 for currency, price in currency_data.items():
-    st.metric(label=currency.replace("=X", ""), value=f"${price:.2f}")
+    st.metric(label=currency.replace("=X", ""), value="N/A" if price is None else f"{price:.4f}")
 
 # Recently Viewed Stocks Section
 st.subheader("Recently Viewed Stocks")
 recently_viewed_symbols = ["TSLA", "8153.T", "RCRT", "0546.HK", "BIRD", "AJINY", "ROE"]
 for rv_symbol in recently_viewed_symbols:
-    rv_stock = yf.Ticker(rv_symbol)
-    rv_info = rv_stock.info
-    rv_data = rv_stock.history(period="1d")
+    try:
+        rv_data = fetch_history(rv_symbol, period="1d")
+    except UpstreamError:
+        rv_data = None
 
-    if not rv_data.empty:
+    if rv_data is not None:
+        rv_info = fetch_info(rv_symbol)
         st.write(f"### {rv_symbol} - {rv_info.get('longName', rv_symbol)}")
-        st.write(f"**Price**: ${rv_info.get('regularMarketPrice', 'N/A')}")
-        st.write(f"**Day Range**: {rv_info.get('dayLow', 'N/A')} - {rv_info.get('dayHigh', 'N/A')}")
-        st.write(f"**52-Week Range**: {rv_info.get('fiftyTwoWeekLow', 'N/A')} - {rv_info.get('fiftyTwoWeekHigh', 'N/A')}")
+        rv_listing = lookup(rv_symbol)
+        if rv_listing:
+            st.write(f"**Exchange**: {rv_listing['exchange']} | **Currency**: {rv_listing['currency']}")
+        # Prices are quoted in the listing's currency and converted for display
+        rv_currency = currency_of(rv_symbol)
+        rv_prices = {field: money.format(rv_info.get(field), rv_currency)
+                     for field in ["regularMarketPrice", "dayLow", "dayHigh", "fiftyTwoWeekLow", "fiftyTwoWeekHigh"]}
+        st.write(f"**Price**: {rv_prices['regularMarketPrice']}")
+        st.write(f"**Day Range**: {rv_prices['dayLow']} - {rv_prices['dayHigh']}")
+        st.write(f"**52-Week Range**: {rv_prices['fiftyTwoWeekLow']} - {rv_prices['fiftyTwoWeekHigh']}")
         st.write(f"**Volume**: {rv_info.get('volume', 'N/A')}")
         st.write(f"**Market Cap**: {rv_info.get('marketCap', 'N/A')}")
         
         # Display day chart as a line graph
         st.write(f"**Day Chart**:")
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=rv_data.index, y=rv_data['Close'], mode='lines', name="Close Price"))
-        fig.update_layout(xaxis_title="Time", yaxis_title="Price (USD)")
+        rv_close, rv_close_currency = money.series(rv_data['Close'], rv_currency)
+        fig.add_trace(go.Scatter(x=rv_data.index, y=rv_close, mode='lines', name="Close Price"))
+        fig.update_layout(xaxis_title="Time", yaxis_title=f"Price ({rv_close_currency})")
         st.plotly_chart(fig)
     else:
         st.write(f"No data available for {rv_symbol}")
@@ -106,22 +138,26 @@ st.subheader("Latest Financial News")
 
 def fetch_yahoo_finance_news():
     url = "https://finance.yahoo.com/markets"
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
-        news = []
-        for item in news_items:
-            title = item.get_text()
-            link = "https://finance.yahoo.com" + item.find("a")["href"]
-            news.append((title, link))
-        return news
-    else:
+    try:
+        response = fetch_url("news", url)
+    except UpstreamError:
         return []
+    soup = BeautifulSoup(response.text, 'html.parser')
+    news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
+    news = []
+    for item in news_items:
+        title = item.get_text()
+        link = "https://finance.yahoo.com" + item.find("a")["href"]
+        news.append((title, link))
+    return news
+
+with section("Latest Financial News"):
+    news = fetch_yahoo_finance_news()
+    if news:
+        for title, link in news:
+            st.write(f"[{title}]({link})")
+    else:
+        st.write("Failed to fetch news.")
 
-news = fetch_yahoo_finance_news()
-if news:
-    for title, link in news:
-        st.write(f"[{title}]({link})")
-else:
-    st.write("Failed to fetch news.")
+# Server memory held for this and other sessions
+usage_panel()
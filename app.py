@@ -1,42 +1,59 @@
 import streamlit as st
-import yfinance as yf
 import datetime
 import plotly.graph_objs as go
 from bs4 import BeautifulSoup
-import requests
+from currency import DISPLAY_CURRENCIES, currency_of, load_converter
+from market_hours import auto_refresh
+from memory_budget import usage_panel
+from resilience import UpstreamError, fetch_history, fetch_info, fetch_url, last_close, section
+from summary_stats import summarize
+from symbol_index import check_symbol, lookup, symbol_input
 
 # Set up the page configuration and title
 st.set_page_config(layout="wide", page_title="Market Overview and Stock Analysis")
 
 # Sidebar for stock selection and date range
 st.sidebar.title("Input Ticker")
-symbol = st.sidebar.text_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA').upper()
+symbol = symbol_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA', st.sidebar)
+symbol_record = check_symbol(symbol, st.sidebar)
 sdate = st.sidebar.date_input('Start Date', value=datetime.date(2024, 1, 1))
 edate = st.sidebar.date_input('End Date', value=datetime.date.today())
+display_currency = st.sidebar.selectbox('Display Currency', DISPLAY_CURRENCIES)
+
+# One batched FX fetch serves every currency conversion on the page
+money, fx = load_converter(display_currency, sdate)
 
 # Main title
 st.title(f"{symbol} Stock Analysis")
 
-# Fetch the stock data
-stock = yf.Ticker(symbol)
-data = stock.history(start=sdate, end=edate)
+# Fetch the stock data; unknown symbols are stopped by the full local index
+data = None
+if symbol_record is not None:
+    try:
+        data = fetch_history(symbol, start=sdate, end=edate)
+    except UpstreamError:
+        pass
 
 # Display stock details if data is available
-if not data.empty:
+if data is not None:
     # Company information
+    info = fetch_info(symbol)
     st.subheader(f"Company Information for {symbol}")
-    st.write(f"**Sector**: {stock.info.get('sector', 'N/A')}")
-    st.write(f"**Beta**: {stock.info.get('beta', 'N/A')}")
+    st.write(f"**Sector**: {info.get('sector', 'N/A')}")
+    st.write(f"**Beta**: {info.get('beta', 'N/A')}")
     
     # Stock data overview
     st.subheader("Stock Data Summary")
-    st.write(data.describe())
+    summary = summarize((symbol, sdate, edate), data)
+    st.write(summary.describe())
+    st.write(summary.performance())
 
     # Plot Closing Price chart
     st.subheader("Closing Price Over Time")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name="Close Price"))
-    fig.update_layout(xaxis_title="Date", yaxis_title="Closing Price (USD)")
+    close, close_currency = money.series(data['Close'], symbol_record["currency"])
+    fig.add_trace(go.Scatter(x=data.index, y=close, mode='lines', name="Close Price"))
+    fig.update_layout(xaxis_title="Date", yaxis_title=f"Closing Price ({close_currency})")
     st.plotly_chart(fig)
 else:
     st.error("Failed to fetch historical data for this stock.")
@@ -54,37 +71,47 @@ indices = {
     "Hang Seng": "^HSI"
 }
 
-index_data = {}
-for name, symbol in indices.items():
-    index = yf.Ticker(symbol)
-    index_info = index.history(period="1d")
-    index_data[name] = index_info["Close"][-1]
+def show_indices():
+    index_data = {}
+    for name, symbol in indices.items():
+        index_data[name] = last_close(symbol)
+
+    # Display indices in a column format, with exchange and currency from the
+    # local symbol index
+    for name, price in index_data.items():
+        listing = lookup(indices[name])
+        listing_help = f"{listing['exchange']}, quoted in {listing['currency']}" if listing else None
+        st.metric(label=name, value=money.format(price, currency_of(indices[name])), help=listing_help)
 
-# Display indices in a column format
-for name, price in index_data.items():
-    st.metric(label=name, value=f"${price:.2f}")
+# Refresh the tiles every minute while any of these markets trades, and
+# otherwise not until the next one opens
+auto_refresh(indices.values(), show_indices)
 
 # Display Market News (Yahoo Finance scraping example)
 st.subheader("Latest Financial News")
 
 def fetch_yahoo_finance_news():
     url = "https://finance.yahoo.com/markets"
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
-        news = []
-        for item in news_items:
-            title = item.get_text()
-            link = "https://finance.yahoo.com" + item.find("a")["href"]
-            news.append((title, link))
-        return news
-    else:
+    try:
+        response = fetch_url("news", url)
+    except UpstreamError:
         return []
+    soup = BeautifulSoup(response.text, 'html.parser')
+    news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
+    news = []
+    for item in news_items:
+        title = item.get_text()
+        link = "https://finance.yahoo.com" + item.find("a")["href"]
+        news.append((title, link))
+    return news
 
-news = fetch_yahoo_finance_news()
-if news:
-    for title, link in news:
-        st.write(f"[{title}]({link})")
-else:
-    st.write("Failed to fetch news.")
+with section("Latest Financial News"):
+    news = fetch_yahoo_finance_news()
+    if news:
+        for title, link in news:
+            st.write(f"[{title}]({link})")
+    else:
+        st.write("Failed to fetch news.")
+
+# Server memory held for this and other sessions
+usage_panel()
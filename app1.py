@@ -1,133 +1,143 @@
 import streamlit as st
-import yfinance as yf
 import datetime
 import plotly.graph_objs as go
 from bs4 import BeautifulSoup
-import requests
+from currency import DISPLAY_CURRENCIES, currency_of, latest_rate, load_converter
+from fetch_pipeline import Pipeline
+from memory_budget import usage_panel
+from resilience import UpstreamError, fetch_history, fetch_info, fetch_url, last_close
+from summary_stats import summarize
+from symbol_index import check_symbol, symbol_input
 
 # Set up the page configuration and title
 st.set_page_config(layout="wide", page_title="Market Overview and Stock Analysis")
 
 # Sidebar for stock selection and date range
 st.sidebar.title("Input Ticker")
-symbol = st.sidebar.text_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA').upper()
+symbol = symbol_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA', st.sidebar)
+symbol_record = check_symbol(symbol, st.sidebar)
 sdate = st.sidebar.date_input('Start Date', value=datetime.date(2024, 1, 1))
 edate = st.sidebar.date_input('End Date', value=datetime.date.today())
+display_currency = st.sidebar.selectbox('Display Currency', DISPLAY_CURRENCIES)
 
-# Main title
-st.title(f"{symbol} Stock Analysis")
+# Market data shown on the overview
+indices = {
+    "S&P 500": "^GSPC",
+    "Dow Jones": "^DJI",
+    "Nasdaq": "^IXIC",
+    "FTSE 100": "^FTSE",
+    "Nikkei 225": "^N225",
+    "Hang Seng": "^HSI"
+}
+currencies = ["USDJPY=X", "EURUSD=X", "GBPUSD=X"]
+commodities = {
+    "Gold": "GC=F",
+    "Silver": "SI=F",
+    "Crude Oil": "CL=F"
+}
+cryptos = {crypto.replace("-USD", ""): crypto for crypto in ["BTC-USD", "ETH-USD", "ADA-USD"]}
 
-# Fetch the stock data
-stock = yf.Ticker(symbol)
-data = stock.history(start=sdate, end=edate)
+def fetch_yahoo_finance_news():
+    url = "https://finance.yahoo.com/markets"
+    try:
+        response = fetch_url("news", url)
+    except UpstreamError:
+        return []
+    soup = BeautifulSoup(response.text, 'html.parser')
+    news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
+    news = []
+    for item in news_items:
+        title = item.get_text()
+        link = "https://finance.yahoo.com" + item.find("a")["href"]
+        news.append((title, link))
+    return news
+
+# Start every upstream fetch at once. The sections below reserve their place
+# on the page and are filled in as soon as the data they need arrives; the
+# quote tiles then refresh every minute while their markets trade, and
+# otherwise not until the next one opens. One batched FX fetch serves every
+# currency conversion on the page.
+pipeline = Pipeline()
+pipeline.fetch("fx", load_converter, display_currency, sdate)
+if symbol_record is not None:
+    pipeline.fetch("history", fetch_history, symbol, start=sdate, end=edate)
+    pipeline.fetch("info", fetch_info, symbol)
+for quote in [*indices.values(), *commodities.values(), *cryptos.values()]:
+    pipeline.fetch(quote, last_close, quote)
+pipeline.fetch("news", fetch_yahoo_finance_news)
+
+def render_stock(data, info, converter):
+    money, fx = converter
 
-# Display stock details if data is available
-if not data.empty:
     # Company information
     st.subheader(f"Company Information for {symbol}")
-    st.write(f"**Sector**: {stock.info.get('sector', 'N/A')}")
-    st.write(f"**Beta**: {stock.info.get('beta', 'N/A')}")
-    
+    st.write(f"**Sector**: {info.get('sector', 'N/A')}")
+    st.write(f"**Beta**: {info.get('beta', 'N/A')}")
+
     # Stock data overview
     st.subheader("Stock Data Summary")
-    st.write(data.describe())
+    summary = summarize((symbol, sdate, edate), data)
+    st.write(summary.describe())
+    st.write(summary.performance())
 
     # Plot Closing Price chart
     st.subheader("Closing Price Over Time")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name="Close Price"))
-    fig.update_layout(xaxis_title="Date", yaxis_title="Closing Price (USD)")
+    close, close_currency = money.series(data['Close'], symbol_record["currency"])
+    fig.add_trace(go.Scatter(x=data.index, y=close, mode='lines', name="Close Price"))
+    fig.update_layout(xaxis_title="Date", yaxis_title=f"Closing Price ({close_currency})")
     st.plotly_chart(fig)
+
+def render_prices(quotes):
+    # Metric per label in quotes ({label: symbol}), in the display currency
+    def render(converter, *prices):
+        money, fx = converter
+        for (label, quote), price in zip(quotes.items(), prices):
+            st.metric(label=label, value=money.format(price, currency_of(quote)))
+    return render
+
+def render_exchange_rates(converter):
+    money, fx = converter
+    # Exchange rates are ratios, not prices, so they carry no currency sign
+    for currency in currencies:
+        price = latest_rate(fx, currency)
+        st.metric(label=currency.replace("=X", ""), value="N/A" if price is None else f"{price:.4f}")
+
+def render_news(news):
+    if news:
+        for title, link in news:
+            st.write(f"[{title}]({link})")
+    else:
+        st.write("Failed to fetch news.")
+
+# Main title
+st.title(f"{symbol} Stock Analysis")
+
+# Stock details; unknown symbols are stopped by the full local index
+if symbol_record is not None:
+    pipeline.section("Stock Data", ["history", "info", "fx"], render_stock)
 else:
     st.error("Failed to fetch historical data for this stock.")
 
 # Market Overview Section
 st.header("Global Markets Overview")
-
-# Display selected indices
-indices = {
-    "S&P 500": "^GSPC",
-    "Dow Jones": "^DJI",
-    "Nasdaq": "^IXIC",
-    "FTSE 100": "^FTSE",
-    "Nikkei 225": "^N225",
-    "Hang Seng": "^HSI"
-}
-
-index_data = {}
-for name, symbol in indices.items():
-    index = yf.Ticker(symbol)
-    index_info = index.history(period="1d")
-    index_data[name] = index_info["Close"][-1]
-
-# Display indices in a column format
-for name, price in index_data.items():
-    st.metric(label=name, value=f"${price:.2f}")
+pipeline.section("Indices", ["fx", *indices.values()], render_prices(indices), refresh=indices.values())
 
 # Currency Exchange Rates
 st.subheader("Currency Exchange Rates")
-currencies = ["USDJPY=X", "EURUSD=X", "GBPUSD=X"]
-currency_data = {}
-for currency in currencies:
-    currency_ticker = yf.Ticker(currency)
-    currency_info = currency_ticker.history(period="1d")
-    currency_data[currency] = currency_info["Close"][-1]
-
-for currency, price in currency_data.items():
-    st.metric(label=currency.replace("=X", ""), value=f"${price:.2f}")
+pipeline.section("Currency Exchange Rates", ["fx"], render_exchange_rates)
 
 # Commodity Prices
 st.subheader("Commodities")
-commodities = {
-    "Gold": "GC=F",
-    "Silver": "SI=F",
-    "Crude Oil": "CL=F"
-}
-commodity_data = {}
-for name, symbol in commodities.items():
-    commodity = yf.Ticker(symbol)
-    commodity_info = commodity.history(period="1d")
-    commodity_data[name] = commodity_info["Close"][-1]
-
-for name, price in commodity_data.items():
-    st.metric(label=name, value=f"${price:.2f}")
+pipeline.section("Commodities", ["fx", *commodities.values()], render_prices(commodities), refresh=commodities.values())
 
 # Cryptocurrency Data
 st.subheader("Cryptocurrencies")
-cryptos = ["BTC-USD", "ETH-USD", "ADA-USD"]
-crypto_data = {}
-for crypto in cryptos:
-    crypto_ticker = yf.Ticker(crypto)
-    crypto_info = crypto_ticker.history(period="1d")
-    crypto_data[crypto] = crypto_info["Close"][-1]
-
-for crypto, price in crypto_data.items():
-    st.metric(label=crypto.replace("-USD", ""), value=f"${price:.2f}")
+pipeline.section("Cryptocurrencies", ["fx", *cryptos.values()], render_prices(cryptos), refresh=cryptos.values())
 
 # Display Market News (Yahoo Finance scraping example)
 st.subheader("Latest Financial News")
-
-def fetch_yahoo_finance_news():
-    url = "https://finance.yahoo.com/markets"
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
-        news = []
-        for item in news_items:
-            title = item.get_text()
-            link = "https://finance.yahoo.com" + item.find("a")["href"]
-            news.append((title, link))
-        return news
-    else:
-        return []
-
-news = fetch_yahoo_finance_news()
-if news:
-    for title, link in news:
-        st.write(f"[{title}]({link})")
-else:
-    st.write("Failed to fetch news.")
+pipeline.section("Latest Financial News", ["news"], render_news)
 
 # Economic Events Calendar (Mock Data as Example)
 st.subheader("Upcoming Economic Events")
@@ -138,3 +148,9 @@ events = [
 ]
 for event in events:
     st.write(f"{event['Date']}: {event['Event']}")
+
+# Fill in every section as its data arrives
+pipeline.run()
+
+# Server memory held for this and other sessions
+usage_panel()
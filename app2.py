@@ -1,42 +1,59 @@
 import streamlit as st
-import yfinance as yf
 import datetime
 import plotly.graph_objs as go
 from bs4 import BeautifulSoup
-import requests
+from currency import DISPLAY_CURRENCIES, currency_of, load_converter
+from memory_budget import usage_panel
+from resilience import UpstreamError, fetch_history, fetch_info, fetch_url, section
+from screener import get_snapshot
+from summary_stats import summarize
+from symbol_index import check_symbol, symbol_input
 
 # Set up the page configuration and title
 st.set_page_config(layout="wide", page_title="Market Overview and Stock Analysis")
 
 # Sidebar for stock selection and date range
 st.sidebar.title("Input Ticker")
-symbol = st.sidebar.text_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA').upper()
+symbol = symbol_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA', st.sidebar)
+symbol_record = check_symbol(symbol, st.sidebar)
 sdate = st.sidebar.date_input('Start Date', value=datetime.date(2024, 1, 1))
 edate = st.sidebar.date_input('End Date', value=datetime.date.today())
+display_currency = st.sidebar.selectbox('Display Currency', DISPLAY_CURRENCIES)
+
+# One batched FX fetch serves every currency conversion on the page
+money, fx = load_converter(display_currency, sdate)
 
 # Main title
 st.title(f"{symbol} Stock Analysis")
 
-# Fetch the stock data
-stock = yf.Ticker(symbol)
-data = stock.history(start=sdate, end=edate)
+# Fetch the stock data; unknown symbols are stopped by the full local index
+data = None
+if symbol_record is not None:
+    try:
+        data = fetch_history(symbol, start=sdate, end=edate)
+    except UpstreamError:
+        pass
 
 # Display stock details if data is available
-if not data.empty:
+if data is not None:
     # Company information
+    info = fetch_info(symbol)
     st.subheader(f"Company Information for {symbol}")
-    st.write(f"**Sector**: {stock.info.get('sector', 'N/A')}")
-    st.write(f"**Beta**: {stock.info.get('beta', 'N/A')}")
+    st.write(f"**Sector**: {info.get('sector', 'N/A')}")
+    st.write(f"**Beta**: {info.get('beta', 'N/A')}")
     
     # Stock data overview
     st.subheader("Stock Data Summary")
-    st.write(data.describe())
+    summary = summarize((symbol, sdate, edate), data)
+    st.write(summary.describe())
+    st.write(summary.performance())
 
     # Plot Closing Price chart
     st.subheader("Closing Price Over Time")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name="Close Price"))
-    fig.update_layout(xaxis_title="Date", yaxis_title="Closing Price (USD)")
+    close, close_currency = money.series(data['Close'], symbol_record["currency"])
+    fig.add_trace(go.Scatter(x=data.index, y=close, mode='lines', name="Close Price"))
+    fig.update_layout(xaxis_title="Date", yaxis_title=f"Closing Price ({close_currency})")
     st.plotly_chart(fig)
 else:
     st.error("Failed to fetch historical data for this stock.")
@@ -59,9 +76,7 @@ mock_data = {
 def display_stock_list(category, symbols):
     st.subheader(category)
     for sym in symbols:
-        ticker = yf.Ticker(sym)
-        info = ticker.info
-        price = info.get("regularMarketPrice", "N/A")
+        info = fetch_info(sym)
         day_low = info.get("dayLow", "N/A")
         day_high = info.get("dayHigh", "N/A")
         fifty_two_week_low = info.get("fiftyTwoWeekLow", "N/A")
@@ -71,36 +86,78 @@ def display_stock_list(category, symbols):
         
         # Display stock info in columns
         col1, col2, col3, col4 = st.columns(4)
-        col1.metric(label=f"{sym} - {info.get('shortName', sym)}", value=f"${price}")
+        col1.metric(label=f"{sym} - {info.get('shortName', sym)}", value=money.format(info.get("regularMarketPrice"), currency_of(sym)))
         col2.write(f"**Day Range**: {day_low} - {day_high}")
         col3.write(f"**52-Week Range**: {fifty_two_week_low} - {fifty_two_week_high}")
         col4.write(f"**Volume**: {volume} | **Market Cap**: {market_cap}")
 
 # Display each stock category
 for category, symbols in mock_data.items():
-    display_stock_list(category, symbols)
+    with section(category):
+        display_stock_list(category, symbols)
+
+# Stock Screener over the local snapshot of fundamentals and quotes
+st.header("Stock Screener")
+SORT_COLUMNS = {
+    "Market Cap": "market_cap",
+    "P/E Ratio": "trailing_pe",
+    "Dividend Yield": "dividend_yield",
+    "Distance from 52-Week High": "from_52w_high",
+    "Volume": "volume",
+    "Symbol": "symbol",
+}
+PAGE_SIZE = 50
+
+snapshot = get_snapshot()
+if snapshot is None:
+    st.info("No screener snapshot found. Build one with `python screener.py build`.")
+else:
+    col1, col2, col3, col4 = st.columns(4)
+    max_pe = col1.number_input("Max P/E Ratio", min_value=0.0, value=30.0, key="max_pe")
+    min_cap = col2.number_input("Min Market Cap ($B)", min_value=0.0, value=1.0, key="min_cap")
+    near_high = col3.slider("Within % of 52-Week High", 0, 100, 100, key="near_high")
+    sectors = col4.multiselect("Sectors", snapshot.sectors(), key="sectors")
+
+    filters = [("trailing_pe", "<=", max_pe), ("market_cap", ">=", min_cap * 1e9)]
+    if near_high < 100:
+        filters.append(("from_52w_high", ">=", -near_high / 100))
+
+    col1, col2, col3 = st.columns(3)
+    sort_label = col1.selectbox("Sort by", list(SORT_COLUMNS), key="sort_by")
+    descending = col2.radio("Order", ["Descending", "Ascending"], horizontal=True, key="order") == "Descending"
+    matches = int(snapshot.mask(filters, sectors).sum())
+    pages = max(1, -(-matches // PAGE_SIZE))
+    page = col3.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="page")
+
+    results, total = snapshot.screen(filters, sectors, SORT_COLUMNS[sort_label], descending, page - 1, PAGE_SIZE)
+    st.caption(f"{total} of {snapshot.size} symbols match")
+    st.dataframe(results, hide_index=True)
 
 # Display Market News (Yahoo Finance scraping example)
 st.subheader("Latest Financial News")
 
 def fetch_yahoo_finance_news():
     url = "https://finance.yahoo.com/markets"
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
-        news = []
-        for item in news_items:
-            title = item.get_text()
-            link = "https://finance.yahoo.com" + item.find("a")["href"]
-            news.append((title, link))
-        return news
-    else:
+    try:
+        response = fetch_url("news", url)
+    except UpstreamError:
         return []
+    soup = BeautifulSoup(response.text, 'html.parser')
+    news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
+    news = []
+    for item in news_items:
+        title = item.get_text()
+        link = "https://finance.yahoo.com" + item.find("a")["href"]
+        news.append((title, link))
+    return news
 
-news = fetch_yahoo_finance_news()
-if news:
-    for title, link in news:
-        st.write(f"[{title}]({link})")
-else:
-    st.write("Failed to fetch news.")
+with section("Latest Financial News"):
+    news = fetch_yahoo_finance_news()
+    if news:
+        for title, link in news:
+            st.write(f"[{title}]({link})")
+    else:
+        st.write("Failed to fetch news.")
+
+# Server memory held for this and other sessions
+usage_panel()
@@ -1,103 +1,141 @@
 import streamlit as st
-import yfinance as yf
 import datetime
 import plotly.graph_objs as go
-import requests
-import pandas as pd
+from bs4 import BeautifulSoup
+from currency import DISPLAY_CURRENCIES, currency_of, latest_rate, load_converter
+from indicators import FIRST_YEAR, INDICATORS, POPULATION, countries, describe_indicator, ensure_fresh, format_value, growth_rate, per_capita, query, relative_to, search_catalog
+from market_hours import auto_refresh
+from memory_budget import usage_panel
+from resilience import UpstreamError, fetch_history, fetch_info, fetch_url, last_close, section
+from summary_stats import summarize
+from symbol_index import check_symbol, lookup, symbol_input
 
 # Set up the page configuration and title
 st.set_page_config(layout="wide", page_title="Market Overview and Economic Data Analysis")
 
 # Sidebar for stock selection and date range
 st.sidebar.title("Stock Analysis")
-symbol = st.sidebar.text_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA').upper()
+symbol = symbol_input('Enter stock symbol (e.g., NVDA, AAPL):', 'NVDA', st.sidebar)
+symbol_record = check_symbol(symbol, st.sidebar)
 sdate = st.sidebar.date_input('Start Date', value=datetime.date(2024, 1, 1))
 edate = st.sidebar.date_input('End Date', value=datetime.date.today())
+display_currency = st.sidebar.selectbox('Display Currency', DISPLAY_CURRENCIES)
+
+# One batched FX fetch serves every currency conversion on the page
+money, fx = load_converter(display_currency, sdate)
 
 # Main title for stock analysis
 st.title(f"{symbol} Stock Analysis")
 
-# Fetch the stock data
-stock = yf.Ticker(symbol)
-data = stock.history(start=sdate, end=edate)
+# Fetch the stock data; unknown symbols are stopped by the full local index
+data = None
+if symbol_record is not None:
+    try:
+        data = fetch_history(symbol, start=sdate, end=edate)
+    except UpstreamError:
+        pass
 
 # Display stock details if data is available
-if not data.empty:
+if data is not None:
     # Company information
+    info = fetch_info(symbol)
     st.subheader(f"Company Information for {symbol}")
-    st.write(f"**Sector**: {stock.info.get('sector', 'N/A')}")
-    st.write(f"**Beta**: {stock.info.get('beta', 'N/A')}")
+    st.write(f"**Sector**: {info.get('sector', 'N/A')}")
+    st.write(f"**Beta**: {info.get('beta', 'N/A')}")
     
     # Stock data overview
     st.subheader("Stock Data Summary")
-    st.write(data.describe())
+    summary = summarize((symbol, sdate, edate), data)
+    st.write(summary.describe())
+    st.write(summary.performance())
 
     # Plot Closing Price chart
     st.subheader("Closing Price Over Time")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name="Close Price"))
-    fig.update_layout(xaxis_title="Date", yaxis_title="Closing Price (USD)")
+    close, close_currency = money.series(data['Close'], symbol_record["currency"])
+    fig.add_trace(go.Scatter(x=data.index, y=close, mode='lines', name="Close Price"))
+    fig.update_layout(xaxis_title="Date", yaxis_title=f"Closing Price ({close_currency})")
     st.plotly_chart(fig)
 else:
     st.error("Failed to fetch historical data for this stock.")
 
-# Economic Data Section: GDP Analysis
-st.header("Global Economic Data: GDP Analysis")
-
-# World Bank API endpoint for GDP data
-WORLD_BANK_API_URL = "http://api.worldbank.org/v2/country/{}/indicator/NY.GDP.MKTP.CD?format=json&date=1960:2022"
-
-# Country codes for selection
-country_codes = {
-    "United States": "USA",
-    "China": "CHN",
-    "Japan": "JPN",
-    "Germany": "DEU",
-    "France": "FRA",
-    "United Kingdom": "GBR",
-    "Brazil": "BRA",
-    "Mexico": "MEX",
-    "India": "IND"
-}
-
-# Multiselect for countries
-selected_countries = st.multiselect("Which countries would you like to view?", list(country_codes.keys()), default=["United States", "China"])
-
-# Function to fetch GDP data for a list of countries
-def fetch_gdp_data(countries):
-    gdp_data = {}
-    for country in countries:
-        code = country_codes[country]
-        response = requests.get(WORLD_BANK_API_URL.format(code))
-        if response.status_code == 200:
-            data = response.json()[1]
-            gdp_data[country] = pd.DataFrame(data)[["date", "value"]].rename(columns={"date": "Year", "value": "GDP"}).set_index("Year").sort_index()
-    return gdp_data
-
-# Fetch GDP data for selected countries
-gdp_data = fetch_gdp_data(selected_countries)
-
-# Display GDP over time
-st.subheader("GDP Over Time")
-if gdp_data:
-    # Combine data for plotting
-    combined_df = pd.concat(gdp_data.values(), keys=gdp_data.keys(), axis=1)
-    combined_df.columns = [f"{country} GDP" for country in gdp_data.keys()]
-
-    # Plot the GDP data
+# Economic Data Section: World Bank indicators served from the local
+# warehouse
+st.header("Global Economic Data")
+
+# Common indicators first; any other comes from the World Bank catalog
+OTHER_INDICATOR = "Other World Bank indicator"
+indicator = st.selectbox(
+    "Indicator", list(INDICATORS) + [OTHER_INDICATOR],
+    format_func=lambda code: INDICATORS[code][0] if code in INDICATORS else code, key="indicator",
+)
+if indicator == OTHER_INDICATOR:
+    search_text = st.text_input("Search the World Bank catalog by name or code (e.g. EN.ATM.CO2E.KT)", key="indicator_search")
+    matches = search_catalog(search_text)
+    if matches:
+        indicator = st.selectbox(
+            "Matching indicators", list(matches),
+            format_func=lambda code: f"{matches[code][0]} ({code})", key="indicator_match",
+        )
+    else:
+        # The catalog is downloaded in the background; until then, or if
+        # nothing matches, the text is used as an indicator code
+        indicator = search_text.strip().upper() or None
+        if indicator:
+            st.caption(f"Not found in the stored catalog; querying {indicator} as an indicator code.")
+indicator_name, indicator_unit = describe_indicator(indicator) if indicator else ("World Bank Indicator", "")
+view = st.radio("Show", ["Level", "Growth rate", "Per capita", "Relative to first country"], horizontal=True, key="indicator_view")
+
+# Refreshed at most once a day; stored data is shown if the API is down
+needed = [] if indicator is None else [indicator, POPULATION] if view == "Per capita" else [indicator]
+if ensure_fresh(needed):
+    st.caption("Could not refresh from the World Bank API; showing stored data.")
+
+# Country names for selection
+country_names = countries()
+country_codes = {name: code for code, name in country_names.items()}
+
+# Multiselect for countries and year range
+selected_countries = st.multiselect(
+    "Which countries would you like to view?", list(country_codes),
+    default=[name for name in ["United States", "China"] if name in country_codes], key="countries",
+)
+this_year = datetime.date.today().year
+start_year, end_year = st.slider("Years", FIRST_YEAR, this_year, (FIRST_YEAR, this_year), key="years")
+
+# Query the warehouse and derive the selected view; there is nothing to
+# query without an indicator and a country
+values = None
+if indicator and selected_countries:
+    economic_data = query(needed, [country_codes[country] for country in selected_countries], start_year, end_year)
+    values = economic_data[indicator]
+    unit = indicator_unit
+    if view == "Growth rate":
+        values, unit = growth_rate(values), "annual % change"
+    elif view == "Per capita":
+        values, unit = per_capita(values, economic_data[POPULATION]), f"{indicator_unit} per person"
+    elif view == "Relative to first country":
+        values, unit = relative_to(values, values.columns[0]), f"ratio to {selected_countries[0]}"
+    values = values.rename(columns=country_names).dropna(how="all")
+
+# Display the indicator over time
+st.subheader(f"{indicator_name} Over Time")
+if values is not None and not values.empty:
     fig = go.Figure()
-    for country in gdp_data.keys():
-        fig.add_trace(go.Scatter(x=combined_df.index, y=combined_df[f"{country} GDP"], mode='lines', name=country))
-    fig.update_layout(xaxis_title="Year", yaxis_title="GDP (Current US$)")
+    for country in values.columns:
+        fig.add_trace(go.Scatter(x=values.index, y=values[country], mode='lines', name=country))
+    fig.update_layout(xaxis_title="Year", yaxis_title=f"{indicator_name} ({unit})")
     st.plotly_chart(fig)
 
-    # Display GDP in the most recent year (2022 if available)
-    st.subheader("GDP in the Most Recent Year")
-    latest_year = combined_df.index[-1]
-    latest_gdp = combined_df.loc[latest_year]
-    for country, gdp in latest_gdp.items():
-        st.metric(label=f"{country} GDP ({latest_year})", value=f"${gdp:,.0f}")
+    # Display the most recent year each country has data for
+    st.subheader(f"{indicator_name} in the Most Recent Year")
+    for country in values.columns:
+        reported = values[country].dropna()
+        if len(reported):
+            st.metric(label=f"{country} ({reported.index[-1]})", value=format_value(reported.iloc[-1], unit))
 
+elif indicator is None:
+    st.write("Enter a World Bank indicator code or search term.")
 else:
     st.write("No data available for the selected countries.")
 
@@ -114,49 +152,58 @@ indices = {
     "Hang Seng": "^HSI"
 }
 
-index_data = {}
-for name, symbol in indices.items():
-    index = yf.Ticker(symbol)
-    index_info = index.history(period="1d")
-    index_data[name] = index_info["Close"][-1]
+def show_indices():
+    index_data = {}
+    for name, symbol in indices.items():
+        index_data[name] = last_close(symbol)
 
-# Display indices in a column format
-for name, price in index_data.items():
-    st.metric(label=name, value=f"${price:.2f}")
+    # Display indices in a column format, with exchange and currency from the
+    # local symbol index
+    for name, price in index_data.items():
+        listing = lookup(indices[name])
+        listing_help = f"{listing['exchange']}, quoted in {listing['currency']}" if listing else None
+        st.metric(label=name, value=money.format(price, currency_of(indices[name])), help=listing_help)
+
+# Refresh the tiles every minute while any of these markets trades, and
+# otherwise not until the next one opens
+auto_refresh(indices.values(), show_indices)
 
 # Currency Exchange Rates
 st.subheader("Currency Exchange Rates")
 currencies = ["USDJPY=X", "EURUSD=X", "GBPUSD=X"]
 currency_data = {}
 for currency in currencies:
-    currency_ticker = yf.Ticker(currency)
-    currency_info = currency_ticker.history(period="1d")
-    currency_data[currency] = currency_info["Close"][-1]
+    currency_data[currency] = latest_rate(fx, currency)
 
+# Exchange rates are ratios, not prices, so they carry no currency sign
 for currency, price in currency_data.items():
-    st.metric(label=currency.replace("=X", ""), value=f"${price:.2f}")
+    st.metric(label=currency.replace("=X", ""), value="N/A" if price is None else f"{price:.4f}")
 
 # Display Market News (Yahoo Finance scraping example)
 st.subheader("Latest Financial News")
 
 def fetch_yahoo_finance_news():
     url = "https://finance.yahoo.com/markets"
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
-        news = []
-        for item in news_items:
-            title = item.get_text()
-            link = "https://finance.yahoo.com" + item.find("a")["href"]
-            news.append((title, link))
-        return news
-    else:
+    try:
+        response = fetch_url("news", url)
+    except UpstreamError:
         return []
+    soup = BeautifulSoup(response.text, 'html.parser')
+    news_items = soup.find_all("h3", {"class": "Mb(5px)"})[:5]  # Get top 5 news
+    news = []
+    for item in news_items:
+        title = item.get_text()
+        link = "https://finance.yahoo.com" + item.find("a")["href"]
+        news.append((title, link))
+    return news
+
+with section("Latest Financial News"):
+    news = fetch_yahoo_finance_news()
+    if news:
+        for title, link in news:
+            st.write(f"[{title}]({link})")
+    else:
+        st.write("Failed to fetch news.")
 
-news = fetch_yahoo_finance_news()
-if news:
-    for title, link in news:
-        st.write(f"[{title}]({link})")
-else:
-    st.write("Failed to fetch news.")
+# Server memory held for this and other sessions
+usage_panel()
@@ -1,10 +1,13 @@
 #Web App
+import streamlit as st
 import matplotlib.pyplot as plt
 import datetime
 import plotly.graph_objs as go
 import appdirs as ad
 ad.user_cache_dir = lambda *args: "/tmp"
-import yfinance as yf
+from resilience import UpstreamError, fetch_history, fetch_info
+from summary_stats import summarize
+from symbol_index import check_symbol, symbol_input
 
 # Specify title and logo for the webpage.
 # Set up your web app
@@ -12,7 +15,7 @@ st.set_page_config(layout="wide", page_title="dam_Demo")
 
 # Sidebar
 st.sidebar.title("Input Ticker")
-symbol = st.sidebar.text_input('Please enter the stock symbol: ', 'AAPL').upper()
+symbol = symbol_input('Please enter the stock symbol: ', 'AAPL', st.sidebar)
 # Selection for a specific time frame.
 col1, col2 = st.sidebar.columns(2, gap="medium")
 with col1:
@@ -22,17 +25,26 @@ with col2:
 
 st.title(f"{symbol}")
 
-stock = yf.Ticker(symbol)
-if stock is not None:
+# Unknown symbols are rejected by the full local index before any network call
+if check_symbol(symbol, st.sidebar) is None:
+  st.stop()
+
+info = fetch_info(symbol)
+if info:
   # Display company's basics
-  st.write(f"# Sector : {stock.info['sector']}")
-  st.write(f"# Company Beta : {stock.info['beta']}")
+  st.write(f"# Sector : {info.get('sector', 'N/A')}")
+  st.write(f"# Company Beta : {info.get('beta', 'N/A')}")
 else:
-  st.error("Failed to fetch historical data.")
+  st.error("Failed to fetch company information.")
 
-data = yf.download(symbol, start=sdate, end=edate)  # Complete the yf.download call
+try:
+  data = fetch_history(symbol, start=sdate, end=edate)
+except UpstreamError:
+  data = None
 if data is not None:
-  st.write(data.describe())
+  summary = summarize((symbol, sdate, edate), data)
+  st.write(summary.describe())
+  st.write(summary.performance())
   st.line_chart(data['Close'],x_label="Date",y_label="Close")
 else:
     st.error("Failed to fetch historical data.")
@@ -0,0 +1,112 @@
+import datetime
+
+import pandas as pd
+import yfinance as yf
+
+from market_hours import refresh_interval
+from resilience import NoDataError, UpstreamError, cached_call, format_price
+from symbol_index import lookup
+
+# Converts prices between currencies with one batched FX download. Every
+# conversion on a page reuses the same date-indexed FX matrix, so showing
+# ten symbols in EUR costs no more requests than showing one.
+
+# Pair quoted per currency, and whether the pair is quoted as units per USD
+FX_PAIRS = {
+    "EUR": ("EURUSD=X", False),
+    "GBP": ("GBPUSD=X", False),
+    "JPY": ("USDJPY=X", True),
+    "HKD": ("USDHKD=X", True),
+}
+DISPLAY_CURRENCIES = ["USD", "EUR", "GBP", "JPY", "HKD"]
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "HKD": "HK$"}
+# Minor units some exchanges quote in (LSE prices are in pence)
+SUBUNITS = {"GBp": ("GBP", 100), "GBX": ("GBP", 100)}
+
+
+def currency_of(symbol):
+    listing = lookup(symbol)
+    return listing["currency"] if listing else "USD"
+
+
+def fetch_fx_rates(start, end=None):
+    # Daily closes for every pair in FX_PAIRS in a single request
+    pairs = [pair for pair, _ in FX_PAIRS.values()]
+    end = end or datetime.date.today() + datetime.timedelta(days=1)
+
+    def load(timeout):
+        data = yf.download(pairs, start=start, end=end, progress=False, timeout=timeout)
+        if data is None or data.empty:
+            raise NoDataError("No FX data returned")
+        closes = data["Close"]
+        closes.index = closes.index.tz_localize(None) if closes.index.tz is not None else closes.index
+        return closes.ffill()
+
+    key = ("fx", str(start), str(end))
+    return cached_call("history", "fx", key, load, refresh_interval(pairs), shard_key="fx")
+
+
+def usd_per_unit(fx):
+    # USD value of one unit of each currency, per date
+    rates = pd.DataFrame(index=fx.index)
+    rates["USD"] = 1.0
+    for currency, (pair, per_usd) in FX_PAIRS.items():
+        if pair in fx:
+            rates[currency] = 1 / fx[pair] if per_usd else fx[pair]
+    return rates.ffill().bfill()
+
+
+class Converter:
+    # Converts prices into target currency. If FX data is unavailable, or a
+    # currency is not covered, prices are left in their own currency.
+    def __init__(self, fx, target):
+        self.target = target
+        self.rates = usd_per_unit(fx) if fx is not None and not fx.empty else None
+
+    def _ratio(self, currency):
+        base, divisor = SUBUNITS.get(currency, (currency, 1))
+        if base == self.target and divisor == 1:
+            return None, base, 1
+        if self.rates is None or base not in self.rates or self.target not in self.rates:
+            return None, base, divisor
+        return self.rates[base] / self.rates[self.target], self.target, divisor
+
+    def series(self, series, currency):
+        # Vectorized conversion using the FX rate of each row's date
+        ratio, to_currency, divisor = self._ratio(currency)
+        if ratio is None:
+            return series / divisor, to_currency
+        dates = series.index
+        if getattr(dates, "tz", None) is not None:
+            dates = dates.tz_localize(None)
+        aligned = ratio.reindex(dates.normalize(), method="ffill").fillna(ratio.iloc[0])
+        return series * aligned.to_numpy() / divisor, to_currency
+
+    def value(self, value, currency):
+        # Conversion of a latest price at the latest FX rate
+        if value is None:
+            return None, currency
+        ratio, to_currency, divisor = self._ratio(currency)
+        if ratio is None:
+            return value / divisor, to_currency
+        return value * ratio.iloc[-1] / divisor, to_currency
+
+    def format(self, value, currency):
+        value, currency = self.value(value, currency)
+        return format_price(value, CURRENCY_SYMBOLS.get(currency, currency + " "))
+
+
+def load_converter(target, start):
+    # Converter for target backed by one FX fetch from start to today
+    try:
+        fx = fetch_fx_rates(start)
+    except UpstreamError:
+        fx = None
+    return Converter(fx, target), fx
+
+
+def latest_rate(fx, pair):
+    if fx is None or pair not in fx:
+        return None
+    closes = fx[pair].dropna()
+    return closes.iloc[-1] if len(closes) else None
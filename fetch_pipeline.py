@@ -0,0 +1,148 @@
+import asyncio
+import os
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import streamlit as st
+
+from market_hours import auto_refresh
+from memory_budget import current_session
+from resilience import section
+
+# Starts every independent fetch on a page at once and fills in each page
+# section as soon as the data it needs has arrived, so the page takes as
+# long as its slowest section rather than the sum of all of them.
+#
+#   pipeline = Pipeline()
+#   pipeline.fetch("quote", last_close, "^GSPC")        # starts immediately
+#   pipeline.section("S&P 500", ["quote"], render_quote)  # reserves its slot
+#   pipeline.run()                                       # renders as data lands
+#
+# Fetches run on worker threads and must not call Streamlit; rendering
+# always happens on the script thread.
+#
+# All sessions share one pool of FETCH_WORKERS threads (environment
+# variable, default 32). So that one session cannot fill it, a pipeline
+# has at most FETCH_JOBS_PER_SESSION (default 8) jobs in the pool at once
+# and queues the rest. A session's newer pipeline (its next rerun) cancels
+# the jobs of the older one that have not started yet, as does a run that
+# ends early. Jobs already running finish, but their results are dropped.
+
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 32))
+FETCH_JOBS_PER_SESSION = int(os.environ.get("FETCH_JOBS_PER_SESSION", 8))
+
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+# Latest pipeline per session
+_pipelines = weakref.WeakValueDictionary()
+_pipelines_lock = threading.Lock()
+
+
+class Pipeline:
+    def __init__(self, max_jobs=FETCH_JOBS_PER_SESSION):
+        self.jobs = {}
+        self.calls = {}
+        self.sections = []
+        self.max_jobs = max_jobs
+        self.waiting = deque()
+        self.running = 0
+        self.lock = threading.Lock()
+
+        session_id = current_session()
+        if session_id is not None:
+            with _pipelines_lock:
+                previous = _pipelines.get(session_id)
+                _pipelines[session_id] = self
+            if previous is not None:
+                previous.cancel()
+
+    def fetch(self, name, fn, *args, **kwargs):
+        # Starts fn(*args, **kwargs) in the background under name, or queues
+        # it while this pipeline already has max_jobs jobs in the pool
+        future = Future()
+        self.jobs[name] = future
+        self.calls[name] = (fn, args, kwargs)
+        with self.lock:
+            self.waiting.append((future, fn, args, kwargs))
+        self._start_waiting()
+        return name
+
+    def cancel(self):
+        # Cancels every job that has not started yet
+        for future in self.jobs.values():
+            future.cancel()
+
+    def _start_waiting(self):
+        with self.lock:
+            while self.running < self.max_jobs and self.waiting:
+                future, fn, args, kwargs = self.waiting.popleft()
+                if future.set_running_or_notify_cancel():
+                    self.running += 1
+                    _executor.submit(self._run_job, future, fn, args, kwargs)
+
+    def _run_job(self, future, fn, args, kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.running -= 1
+            self._start_waiting()
+
+    def section(self, title, needs, render, refresh=()):
+        # Reserves a placeholder at this point of the page, shows a skeleton
+        # in it, and later calls render(*results) inside it once every job
+        # in needs has finished. If refresh names quote symbols, the section
+        # is fetched and drawn again on their markets' schedule afterwards
+        # (see market_hours.auto_refresh).
+        placeholder = st.empty()
+        placeholder.caption(f"⏳ Loading {title}...")
+        self.sections.append((title, list(needs), render, placeholder, list(refresh)))
+
+    def run(self):
+        try:
+            asyncio.run(self._render_all())
+        finally:
+            # A rerun or stop interrupts rendering; nothing is waiting for
+            # the remaining jobs any more
+            self.cancel()
+
+    async def _render_all(self):
+        futures = {name: asyncio.wrap_future(job) for name, job in self.jobs.items()}
+        await asyncio.gather(*(self._render(futures, *entry) for entry in self.sections))
+
+    async def _render(self, futures, title, needs, render, placeholder, refresh):
+        # Failures are collected instead of raised so the other sections
+        # keep rendering; section() reports them inside this placeholder.
+        results = await asyncio.gather(*(futures[name] for name in needs), return_exceptions=True)
+        if refresh:
+            # Drawn by a fragment from the start, since a fragment may only
+            # write outside itself where it wrote in the full run
+            auto_refresh(refresh, self._redraw(title, needs, render, placeholder, results))
+        else:
+            _draw(title, render, placeholder, results)
+
+    def _redraw(self, title, needs, render, placeholder, results):
+        # Draws results the first time; each later call (on the refresh
+        # schedule) repeats the section's fetches straight on the pool and
+        # draws those. They are cache hits unless a quote has expired.
+        def redraw():
+            nonlocal results
+            if results is None:
+                jobs = [_executor.submit(fn, *args, **kwargs) for fn, args, kwargs in (self.calls[name] for name in needs)]
+                results = [job.exception() or job.result() for job in jobs]
+            _draw(title, render, placeholder, results)
+            results = None
+
+        return redraw
+
+
+def _draw(title, render, placeholder, results):
+    with placeholder.container():
+        with section(title):
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            render(*results)
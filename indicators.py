@@ -0,0 +1,306 @@
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import shared_cache
+from memory_budget import shared_get, shared_put
+from resilience import NoDataError, UpstreamError, fetch_url
+
+# World Bank indicators kept in a local SQLite warehouse. Each indicator is
+# downloaded for every country in one paged request, then refreshed at most
+# once a day by re-reading only the most recent years, on a background
+# thread. Page queries are answered from an in-memory year x country frame
+# per indicator, loaded from the warehouse once per refresh, and only wait
+# on the API for an indicator that has never been downloaded. Any indicator
+# in the World Bank catalog can be queried; INDICATORS are the ones offered
+# first.
+
+WORLD_BANK_URL = "https://api.worldbank.org/v2"
+FIRST_YEAR = 1960
+# The World Bank revises recent values, so refreshes re-read this many
+# years before the latest one stored
+REVISION_YEARS = 2
+REFRESH_INTERVAL = 24 * 60 * 60
+# Seconds before a failed refresh is tried again
+RETRY_INTERVAL = 15 * 60
+PAGE_SIZE = 20000
+
+DB_PATH = os.environ.get("INDICATOR_DB", os.path.join(shared_cache.DEFAULT_DIR, "indicators.sqlite"))
+
+# Indicator code -> (name, unit)
+INDICATORS = {
+    "NY.GDP.MKTP.CD": ("GDP", "current US$"),
+    "NY.GDP.PCAP.CD": ("GDP per capita", "current US$"),
+    "NY.GDP.MKTP.KD.ZG": ("GDP growth", "annual %"),
+    "SP.POP.TOTL": ("Population", "people"),
+    "FP.CPI.TOTL.ZG": ("Inflation, consumer prices", "annual %"),
+    "SL.UEM.TOTL.ZS": ("Unemployment", "% of labor force"),
+    "NE.EXP.GNFS.ZS": ("Exports of goods and services", "% of GDP"),
+    "NE.IMP.GNFS.ZS": ("Imports of goods and services", "% of GDP"),
+    "GC.DOD.TOTL.GD.ZS": ("Central government debt", "% of GDP"),
+    "BN.CAB.XOKA.CD": ("Current account balance", "current US$"),
+}
+POPULATION = "SP.POP.TOTL"
+
+# Used until the full country list has been downloaded once
+DEFAULT_COUNTRIES = {
+    "USA": "United States",
+    "CHN": "China",
+    "JPN": "Japan",
+    "DEU": "Germany",
+    "FRA": "France",
+    "GBR": "United Kingdom",
+    "BRA": "Brazil",
+    "MEX": "Mexico",
+    "IND": "India",
+}
+
+_local = threading.local()
+
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="indicator-refresh")
+_refresh_lock = threading.Lock()
+# Name -> future of the refresh running for it in this process
+_refreshing = {}
+# Name -> (monotonic time of the last refresh attempt, whether it failed)
+_attempts = {}
+
+
+def connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        shared_cache.private_dir(os.path.dirname(DB_PATH))
+        conn = _local.conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS observations ("
+            "indicator TEXT, country TEXT, year INTEGER, value REAL, "
+            "PRIMARY KEY (indicator, country, year))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS countries ("
+            "code TEXT PRIMARY KEY, name TEXT, region TEXT, aggregate INTEGER)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS refreshes (indicator TEXT PRIMARY KEY, refreshed_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS catalog (code TEXT PRIMARY KEY, name TEXT, unit TEXT)")
+    return conn
+
+
+def fetch_pages(path, **params):
+    # All rows of a paged World Bank API response
+    rows = []
+    page = 1
+    while True:
+        query = "&".join(f"{key}={value}" for key, value in {**params, "format": "json", "page": page}.items())
+        response = fetch_url("worldbank", f"{WORLD_BANK_URL}/{path}?{query}")
+        try:
+            meta, data = response.json()
+        except ValueError:
+            raise NoDataError(f"No World Bank data for {path}")
+        rows.extend(data or [])
+        if page >= int(meta.get("pages", 1)):
+            return rows
+        page += 1
+
+
+def refresh_countries():
+    rows = fetch_pages("country", per_page=400)
+    with connect() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO countries (code, name, region, aggregate) VALUES (?, ?, ?, ?)",
+            [(row["id"], row["name"], row["region"]["value"], row["region"]["value"] == "Aggregates")
+             for row in rows],
+        )
+    return len(rows)
+
+
+def _name_and_unit(row):
+    # The catalog's unit field is mostly empty; names end in the unit
+    # instead, as in "GDP (current US$)"
+    name = (row.get("name") or row["id"]).strip()
+    unit = (row.get("unit") or "").strip()
+    match = re.fullmatch(r"(.*\S)\s*\(([^()]*)\)", name)
+    if match and not unit:
+        name, unit = match.groups()
+    return name, unit
+
+
+def refresh_catalog():
+    # Every indicator the World Bank API publishes
+    rows = fetch_pages("indicator", per_page=PAGE_SIZE)
+    with connect() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO catalog (code, name, unit) VALUES (?, ?, ?)",
+            [(row["id"], *_name_and_unit(row)) for row in rows if row.get("id")],
+        )
+    return len(rows)
+
+
+def refresh_indicator(code):
+    # Downloads years not yet stored (plus the revision window) for every
+    # country in one paged request
+    conn = connect()
+    latest = conn.execute("SELECT MAX(year) FROM observations WHERE indicator = ?", (code,)).fetchone()[0]
+    start = FIRST_YEAR if latest is None else latest - REVISION_YEARS
+    rows = fetch_pages(
+        f"country/all/indicator/{code}",
+        date=f"{start}:{datetime.date.today().year}",
+        per_page=PAGE_SIZE,
+    )
+    records = [
+        (code, row["countryiso3code"], int(row["date"]), row["value"])
+        for row in rows
+        if row.get("countryiso3code") and row["value"] is not None
+    ]
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO observations (indicator, country, year, value) VALUES (?, ?, ?, ?)",
+            records,
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO refreshes (indicator, refreshed_at) VALUES (?, julianday('now'))", (code,)
+        )
+    return len(records)
+
+
+def _refresh(name, refresh):
+    # Runs on the refresh executor; the shared cache makes sure only one
+    # worker process downloads each indicator per REFRESH_INTERVAL. Any
+    # error counts as a failed attempt (a locked database or an unexpected
+    # payload as much as an unreachable API), so it is retried later.
+    failed = True
+    try:
+        shared_cache.get_or_load("indicator-refresh", name, refresh, REFRESH_INTERVAL)
+        failed = False
+    except UpstreamError:
+        pass
+    finally:
+        with _refresh_lock:
+            _attempts[name] = (time.monotonic(), failed)
+            del _refreshing[name]
+
+
+def _is_stored(code):
+    return connect().execute("SELECT 1 FROM refreshes WHERE indicator = ?", (code,)).fetchone() is not None
+
+
+def ensure_fresh(codes):
+    # Starts a background refresh of each indicator (and the country list
+    # and catalog) that is due, so reruns keep reading the warehouse while it runs. A
+    # failed refresh is retried after RETRY_INTERVAL rather than on every
+    # rerun. Only an indicator with no stored data yet is waited for.
+    # Returns the names whose last refresh failed; their stored data is
+    # still served.
+    now = time.monotonic()
+    started = {}
+    with _refresh_lock:
+        for name, refresh in [("countries", refresh_countries), ("catalog", refresh_catalog)] + [
+            (code, lambda code=code: refresh_indicator(code)) for code in codes
+        ]:
+            attempted_at, failed = _attempts.get(name, (None, False))
+            interval = RETRY_INTERVAL if failed else REFRESH_INTERVAL
+            if name not in _refreshing and (attempted_at is None or now - attempted_at > interval):
+                _refreshing[name] = _refresh_executor.submit(_refresh, name, refresh)
+            if name in _refreshing:
+                started[name] = _refreshing[name]
+    wait([future for name, future in started.items() if name in codes and not _is_stored(name)])
+    with _refresh_lock:
+        return [name for name, (_, failed) in _attempts.items() if failed and (name == "countries" or name in codes)]
+
+
+def countries(include_aggregates=False):
+    # Code -> name for every known country
+    query = "SELECT code, name FROM countries"
+    if not include_aggregates:
+        query += " WHERE aggregate = 0"
+    rows = connect().execute(query + " ORDER BY name").fetchall()
+    return dict(rows) if rows else dict(DEFAULT_COUNTRIES)
+
+
+def describe_indicator(code):
+    # (name, unit) of an indicator, from INDICATORS or the catalog
+    if code in INDICATORS:
+        return INDICATORS[code]
+    row = connect().execute("SELECT name, unit FROM catalog WHERE code = ?", (code,)).fetchone()
+    return tuple(row) if row else (code, "")
+
+
+def search_catalog(text, limit=50):
+    # Code -> (name, unit) for catalog indicators whose code or name
+    # contains text, an exact code first
+    text = text.strip()
+    if not text:
+        return {}
+    pattern = "%" + re.sub(r"([\\%_])", r"\\\1", text) + "%"
+    rows = connect().execute(
+        "SELECT code, name, unit FROM catalog WHERE code LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\' "
+        "ORDER BY code = ? COLLATE NOCASE DESC, name LIMIT ?",
+        (pattern, pattern, text, limit),
+    ).fetchall()
+    return {code: (name, unit) for code, name, unit in rows}
+
+
+def indicator_frame(code):
+    # Year x country frame with every stored value of one indicator, reloaded
+    # only when a refresh (by any worker) has changed the warehouse or the
+    # memory budget has evicted it
+    conn = connect()
+    row = conn.execute("SELECT refreshed_at FROM refreshes WHERE indicator = ?", (code,)).fetchone()
+    version = row[0] if row else None
+    cached = shared_get("indicator", code)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    rows = conn.execute("SELECT country, year, value FROM observations WHERE indicator = ?", (code,)).fetchall()
+    if rows:
+        country_of, year_of, values = zip(*rows)
+        codes = sorted(set(country_of))
+        position = {country: i for i, country in enumerate(codes)}
+        years = np.arange(min(year_of), max(year_of) + 1)
+        grid = np.full((len(years), len(codes)), np.nan)
+        grid[np.asarray(year_of) - years[0], [position[country] for country in country_of]] = values
+        frame = pd.DataFrame(grid, index=years, columns=codes)
+    else:
+        frame = pd.DataFrame(dtype=float)
+    shared_put("indicator", code, (version, frame))
+    return frame
+
+
+def query(codes, country_codes, start=FIRST_YEAR, end=None):
+    # Wide frame indexed by year with (indicator, country) columns
+    end = end or datetime.date.today().year
+    country_codes = list(country_codes)
+    frames = {}
+    for code in codes:
+        frame = indicator_frame(code)
+        frames[code] = frame.loc[(frame.index >= start) & (frame.index <= end)].reindex(columns=country_codes)
+    return pd.concat(frames, axis=1).rename_axis("Year")
+
+
+# Derived metrics; each takes and returns a year x country frame
+
+
+def growth_rate(frame):
+    return frame.pct_change(fill_method=None) * 100
+
+
+def per_capita(frame, population):
+    return frame / population.reindex_like(frame)
+
+
+def relative_to(frame, country):
+    return frame.div(frame[country], axis=0)
+
+
+def format_value(value, unit):
+    if "US$" in unit:
+        return f"${value:,.0f}"
+    if "%" in unit:
+        return f"{value:,.2f}%"
+    return f"{value:,.2f}"
@@ -0,0 +1,349 @@
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import streamlit
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, local_script_runner
+
+import memory_budget
+from stub_providers import LATENCY, StubProviders
+
+# Load test for the pages. Simulates concurrent users, each running its own
+# session of a page in this process (as the Streamlit server does) and
+# clicking through a realistic interaction script, with every upstream
+# replaced by the offline stub providers. For each user count it reports
+# rerun latency percentiles, throughput, upstream calls per rerun and
+# memory growth, then where throughput stops scaling.
+#
+#   python loadtest.py --users 1,2,4,8,16 --duration 20
+#
+# Caches start empty in a temporary directory and are warmed by one user
+# per page before the sweep (--cold skips that).
+#
+# AppTest has no public session id or shared script cache, so the harness
+# uses a few Streamlit internals. It supports the Streamlit version pinned
+# in requirements-dev.txt and stops before the sweep if they are missing.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PAGES = ["app3.py", "6cadama.py"]
+TICKERS = ["AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "META", "JPM", "KO", "DIS", "INTC", "IBM", "CVX"]
+# A level saturates when it adds less than this much throughput
+SATURATION_GAIN = 0.1
+STREAMLIT_VERSION = "1.66.0"
+
+
+# Interaction scripts: each action changes one widget of a running page
+
+def change_ticker(at, rng):
+    at.text_input(key="ticker" if "ticker" in at.session_state else "symbol").set_value(rng.choice(TICKERS))
+
+
+def toggle_moving_averages(at, rng):
+    if "show_ma" not in at.session_state:
+        return change_ticker(at, rng)
+    at.checkbox(key="show_ma").set_value(not at.session_state["show_ma"])
+
+
+def switch_chart_type(at, rng):
+    if "chart_type" in at.session_state:
+        at.radio(key="chart_type").set_value(rng.choice(["Line Chart", "Candlestick Chart"]))
+    else:
+        radio = at.radio(key="indicator_view")
+        radio.set_value(rng.choice(radio.options))
+
+
+def pick_countries(at, rng):
+    multiselect = at.multiselect(key="countries")
+    multiselect.set_value(rng.sample(multiselect.options, rng.randint(1, 4)))
+
+
+SCRIPTS = {
+    "app3.py": [change_ticker, switch_chart_type, pick_countries, pick_countries],
+    "6cadama.py": [change_ticker, toggle_moving_averages, switch_chart_type, switch_chart_type],
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, page, seconds, error=None):
+        with self.lock:
+            self.latencies.append(seconds)
+            if error:
+                self.errors[f"{page}: {error}"] += 1
+
+
+# Each simulated user gets its own session id, and is reported as
+# disconnected once it finishes, so the memory budget sees real sessions
+_active_sessions = set()
+
+
+def _internal(obj, name):
+    # obj.name, for a Streamlit internal the harness relies on
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        raise RuntimeError(
+            f"loadtest.py needs {type(obj).__name__}.{name}, which Streamlit {streamlit.__version__} "
+            f"does not have; it supports Streamlit {STREAMLIT_VERSION}"
+        ) from None
+
+
+def _probe_internals():
+    # Runs in an AppTest script; records whether the script's session state
+    # wraps the state object the test holds
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    st.session_state["has_state"] = hasattr(get_script_run_ctx().session_state, "_state")
+
+
+class _RunScripts:
+    # Script cache for one AppTest run: compiles through the cache shared by
+    # every user, as the server compiles each page once for all sessions,
+    # and remembers whether this run's compile failed
+    def __init__(self, shared):
+        self.shared = shared
+        self.error = None
+
+    def get_bytecode(self, script_path):
+        try:
+            return self.shared.get_bytecode(script_path)
+        except Exception as e:
+            self.error = e
+            raise
+
+    def clear(self):
+        self.shared.clear()
+
+
+# The script cache of the latest run started on each user's thread
+_runs = threading.local()
+
+
+def share_script_cache(shared):
+    # LocalScriptRunner would otherwise compile the page on every run, and
+    # concurrent compiles are not thread-safe. The runner is created on the
+    # thread calling at.run(), so each user sees its own run's cache.
+    _internal(local_script_runner, "ScriptCache")
+
+    def script_cache():
+        _runs.scripts = _RunScripts(shared)
+        return _runs.scripts
+
+    local_script_runner.ScriptCache = script_cache
+
+
+def check_streamlit():
+    # Fails before any user starts if an internal the harness uses is
+    # missing or no longer has an effect
+    _runs.scripts = None
+    at = AppTest.from_function(_probe_internals).run()
+    _internal(_internal(at, "_session_state"), "_state")
+    if at.exception or not at.session_state["has_state"]:
+        raise RuntimeError(
+            f"loadtest.py needs SafeSessionState._state, which Streamlit {streamlit.__version__} "
+            f"does not have; it supports Streamlit {STREAMLIT_VERSION}"
+        )
+    if _runs.scripts is None:
+        raise RuntimeError(
+            f"LocalScriptRunner no longer compiles through local_script_runner.ScriptCache in "
+            f"Streamlit {streamlit.__version__}; loadtest.py supports Streamlit {STREAMLIT_VERSION}"
+        )
+
+
+def _run_error(at):
+    # First line of what stopped the last run, or None if it completed
+    scripts = getattr(_runs, "scripts", None)
+    if scripts is not None and scripts.error is not None:
+        # A compile error stops the run before the page shows anything
+        return f"Compile error: {type(scripts.error).__name__}: {scripts.error}"
+    return at.exception[0].value.splitlines()[0] if at.exception else None
+
+
+def _session_id(state):
+    return f"user-{id(state):x}"
+
+
+def _simulated_session():
+    # Replaces memory_budget.current_session, since every AppTest run
+    # reports the same session id
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return None if ctx is None else _session_id(_internal(ctx.session_state, "_state"))
+
+
+def _open_session(page):
+    at = AppTest.from_file(os.path.join(HERE, page), default_timeout=120)
+    session = _session_id(_internal(_internal(at, "_session_state"), "_state"))
+    _active_sessions.add(session)
+    return at, session
+
+
+def run_user(page, deadline, recorder, seed, think=0.0, steps=None):
+    rng = random.Random(seed)
+    at, session = _open_session(page)
+    try:
+        action = None
+        step = 0
+        while time.monotonic() < deadline and (steps is None or step < steps):
+            if action is not None:
+                try:
+                    action(at, rng)
+                except (KeyError, ValueError):
+                    # The widget is not on the page this time (the last
+                    # run failed or stopped early); just rerun
+                    pass
+            started = time.monotonic()
+            _runs.scripts = None
+            try:
+                at.run()
+                error = _run_error(at)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                at = None
+            recorder.record(page, time.monotonic() - started, error)
+            if at is None:
+                # AppTest cannot rerun this session any more; reload the
+                # page in a new one rather than failing every later rerun
+                _active_sessions.discard(session)
+                at, session = _open_session(page)
+                action = None
+            else:
+                action = rng.choice(SCRIPTS[page])
+            step += 1
+            if think:
+                time.sleep(rng.uniform(0, 2 * think))
+    finally:
+        _active_sessions.discard(session)
+
+
+def run_level(users, duration, stubs, think=0.0, seed=0):
+    # Runs users concurrently (spread over PAGES) for duration seconds
+    recorder = Recorder()
+    calls_before = Counter(stubs.calls)
+    rss_before = memory_budget.process_rss()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=run_user, args=(PAGES[i % len(PAGES)], deadline, recorder, seed + i, think))
+        for i in range(users)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    rss_after = memory_budget.process_rss()
+    tracked = memory_budget._budget.used
+    # Every user has disconnected; their session data should be released
+    memory_budget._budget.sweep()
+
+    latencies = np.array(recorder.latencies) * 1000
+    calls = stubs.calls - calls_before
+    reruns = len(latencies)
+    return {
+        "users": users,
+        "reruns": reruns,
+        "errors": sum(recorder.errors.values()),
+        "error_kinds": recorder.errors,
+        "throughput": reruns / elapsed,
+        "p50": np.percentile(latencies, 50) if reruns else float("nan"),
+        "p95": np.percentile(latencies, 95) if reruns else float("nan"),
+        "p99": np.percentile(latencies, 99) if reruns else float("nan"),
+        "upstream": sum(calls.values()),
+        "amplification": sum(calls.values()) / reruns if reruns else float("nan"),
+        "calls": calls,
+        "rss_growth": rss_after - rss_before,
+        "tracked": tracked,
+        "retained": memory_budget._budget.used,
+    }
+
+
+def saturation_point(results):
+    # First level whose extra users add less than SATURATION_GAIN throughput
+    for previous, current in zip(results, results[1:]):
+        if current["throughput"] < previous["throughput"] * (1 + SATURATION_GAIN):
+            return previous
+    return None
+
+
+def report(results):
+    print(f"{'users':>5} {'reruns':>7} {'err':>4} {'rerun/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'calls/rerun':>11} {'RSS growth':>11} {'tracked':>10} {'retained':>10}")
+    for r in results:
+        print(f"{r['users']:>5} {r['reruns']:>7} {r['errors']:>4} {r['throughput']:>8.2f} {r['p50']:>8.0f} "
+              f"{r['p95']:>8.0f} {r['p99']:>8.0f} {r['amplification']:>11.2f} "
+              f"{memory_budget.format_bytes(max(r['rss_growth'], 0)):>11} "
+              f"{memory_budget.format_bytes(r['tracked']):>10} {memory_budget.format_bytes(r['retained']):>10}")
+    print()
+    for r in results:
+        if r["calls"]:
+            print(f"{r['users']:>3} users, upstream calls: " + ", ".join(
+                f"{endpoint} {count}" for endpoint, count in sorted(r["calls"].items())))
+        for error, count in r["error_kinds"].most_common(3):
+            print(f"{r['users']:>3} users, {count} x {error}")
+    print()
+    peak = saturation_point(results)
+    if peak is None:
+        print("Throughput was still rising at the largest user count; try more users.")
+    else:
+        print(f"Throughput saturates at about {peak['users']} users ({peak['throughput']:.2f} reruns/s); "
+              f"beyond that, more users mostly add latency.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent users against the pages.")
+    parser.add_argument("--users", default="1,2,4,8,16", help="comma-separated user counts to sweep")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per user count")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds a user waits between actions")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="mean simulated upstream latency (seconds)")
+    parser.add_argument("--pages", default=",".join(PAGES), help="comma-separated pages to exercise")
+    parser.add_argument("--cold", action="store_true", help="skip warming the caches before the sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Keep the test's cache and warehouse away from a real server's
+    cache_dir = tempfile.mkdtemp(prefix="loadtest-cache-")
+    os.environ["CACHE_DIR"] = cache_dir
+    os.environ["INDICATOR_DB"] = os.path.join(cache_dir, "indicators.sqlite")
+    PAGES[:] = [page.strip() for page in args.pages.split(",") if page.strip()]
+    # Simulated users are separate sessions to the memory budget, and
+    # disconnect when their thread ends
+    memory_budget.current_session = _simulated_session
+    memory_budget.is_active_session = lambda session_id: session_id in _active_sessions
+    share_script_cache(ScriptCache())
+    check_streamlit()
+    # AppTest warns on every run that it starts outside a script run (a
+    # filter, since Streamlit resets its loggers' levels)
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage())
+
+    with StubProviders(latency=args.latency, seed=args.seed) as stubs:
+        if not args.cold:
+            recorder = Recorder()
+            for page in PAGES:
+                run_user(page, time.monotonic() + 600, recorder, args.seed, steps=1)
+            print(f"Warmed caches with {sum(stubs.calls.values())} upstream calls")
+
+        results = []
+        for users in [int(count) for count in args.users.split(",")]:
+            result = run_level(users, args.duration, stubs, args.think, args.seed)
+            results.append(result)
+            print(f"{users} users: {result['throughput']:.2f} reruns/s, p95 {result['p95']:.0f} ms")
+        print()
+        report(results)
+
+
+if __name__ == "__main__":
+    main()
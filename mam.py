@@ -4,36 +4,37 @@ import datetime
 import plotly.graph_objs as go
 import appdirs as ad
 ad.user_cache_dir = lambda *args: "/tmp"
-import yfinance as yf
+from resilience import fetch_info, last_close
+from symbol_index import check_symbol, symbol_input
 # Title of the app
 st.title("Financial Information App")
 
 # Input for stock ticker
-ticker = st.text_input("Enter Stock Ticker (e.g., AAPL, GOOGL):")
+ticker = symbol_input("Enter Stock Ticker (e.g., AAPL, GOOGL):", key="ticker")
 
 if ticker:
-    # Fetching stock data
-    stock_data = yf.Ticker(ticker)
+    # Unknown symbols are rejected by the full local index before any network call
+    if check_symbol(ticker) is None:
+        st.stop()
 
     # Fetching the current price and other financial metrics
     st.subheader(f"Current Price of {ticker}:")
-    try:
-        price = stock_data.history(period='1d')['Close'][0]
+    price = last_close(ticker)
+    if price is not None:
         st.write(f"💵 **Current Price:** ${price:.2f}")
+    else:
+        st.error(f"Error fetching price data for {ticker}")
 
-        # Displaying additional financial metrics
-        st.subheader("Financial Metrics:")
-        info = stock_data.info
-        metrics = {
-            "Market Cap": info.get('marketCap', 'N/A'),
-            "PE Ratio": info.get('trailingPE', 'N/A'),
-            "Dividend Yield": info.get('dividendYield', 'N/A'),
-            "52 Week High": info.get('fiftyTwoWeekHigh', 'N/A'),
-            "52 Week Low": info.get('fiftyTwoWeekLow', 'N/A'),
-        }
+    # Displaying additional financial metrics
+    st.subheader("Financial Metrics:")
+    info = fetch_info(ticker)
+    metrics = {
+        "Market Cap": info.get('marketCap', 'N/A'),
+        "PE Ratio": info.get('trailingPE', 'N/A'),
+        "Dividend Yield": info.get('dividendYield', 'N/A'),
+        "52 Week High": info.get('fiftyTwoWeekHigh', 'N/A'),
+        "52 Week Low": info.get('fiftyTwoWeekLow', 'N/A'),
+    }
 
-        for metric, value in metrics.items():
-            st.write(f"{metric}: {value}")
-
-    except Exception as e:
-        st.error(f"Error fetching data for {ticker}: {e}")
+    for metric, value in metrics.items():
+        st.write(f"{metric}: {value}")
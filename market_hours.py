@@ -0,0 +1,161 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+import streamlit as st
+
+from symbol_index import lookup
+
+# Trading sessions per exchange, used to decide how long a quote may be
+# cached and how often the overview tiles refresh. A live market is polled
+# every LIVE_TTL seconds; a closed one is not fetched again until it
+# reopens. Exchange holidays are not modelled, so on a holiday the market
+# is polled as if it were open.
+
+LIVE_TTL = 60
+# Keep polling this long after the close, until the final price settles
+SETTLE_AFTER_CLOSE = datetime.timedelta(minutes=15)
+
+WEEKDAYS = range(5)
+ALL_DAYS = range(7)
+
+
+def _time(text):
+    if text == "24:00":
+        return datetime.time.max
+    hour, minute = map(int, text.split(":"))
+    return datetime.time(hour, minute)
+
+
+def _daily(tz, *ranges, days=WEEKDAYS):
+    # Same sessions (local "HH:MM" pairs) on each of days
+    return {"tz": ZoneInfo(tz), "sessions": [(day, _time(start), _time(end)) for day in days for start, end in ranges]}
+
+
+def _weekly_from_sunday(tz, open_at, close_at, daily_break=None):
+    # Sunday open_at to Friday close_at, with an optional daily break
+    # (CME Globex futures and spot FX)
+    sessions = [(6, _time(open_at), datetime.time.max)]
+    for day in range(5):
+        if daily_break and day < 4:
+            sessions.append((day, datetime.time.min, _time(daily_break[0])))
+            sessions.append((day, _time(daily_break[1]), datetime.time.max))
+        elif day < 4:
+            sessions.append((day, datetime.time.min, datetime.time.max))
+        else:
+            sessions.append((day, datetime.time.min, _time(close_at)))
+    return {"tz": ZoneInfo(tz), "sessions": sessions}
+
+
+US_EQUITIES = _daily("America/New_York", ("09:30", "16:00"))
+
+EXCHANGES = {
+    "NYSE": US_EQUITIES,
+    "NASDAQ": US_EQUITIES,
+    "NYSE Arca": US_EQUITIES,
+    "NYSE American": US_EQUITIES,
+    "Cboe BZX": US_EQUITIES,
+    "IEX": US_EQUITIES,
+    "OTC": US_EQUITIES,
+    "SNP": US_EQUITIES,
+    "DJI": US_EQUITIES,
+    "LSE": _daily("Europe/London", ("08:00", "16:30")),
+    "XETRA": _daily("Europe/Berlin", ("09:00", "17:30")),
+    "Euronext Paris": _daily("Europe/Paris", ("09:00", "17:30")),
+    "TSE": _daily("Asia/Tokyo", ("09:00", "11:30"), ("12:30", "15:30")),
+    "OSE": _daily("Asia/Tokyo", ("09:00", "11:30"), ("12:30", "15:30")),
+    "HKEX": _daily("Asia/Hong_Kong", ("09:30", "12:00"), ("13:00", "16:00")),
+    "COMEX": _weekly_from_sunday("America/New_York", "18:00", "17:00", daily_break=("17:00", "18:00")),
+    "NYMEX": _weekly_from_sunday("America/New_York", "18:00", "17:00", daily_break=("17:00", "18:00")),
+    "CCY": _weekly_from_sunday("America/New_York", "17:00", "17:00"),
+    "CCC": _daily("UTC", ("00:00", "24:00"), days=ALL_DAYS),
+}
+
+# Exchange by Yahoo symbol suffix, for symbols missing from the index
+SUFFIXES = {".T": "TSE", ".HK": "HKEX", ".L": "LSE", ".DE": "XETRA", ".PA": "Euronext Paris",
+            "=X": "CCY", "=F": "COMEX", "-USD": "CCC"}
+
+
+def exchange_of(symbol):
+    listing = lookup(symbol)
+    if listing and listing["exchange"] in EXCHANGES:
+        return listing["exchange"]
+    for suffix, exchange in SUFFIXES.items():
+        if symbol.upper().endswith(suffix):
+            return exchange
+    return "NYSE"
+
+
+def _now(now):
+    return now or datetime.datetime.now(datetime.timezone.utc)
+
+
+def _session_bounds(exchange, now):
+    # (start, end) of each session in the week around now, as aware datetimes
+    calendar = EXCHANGES[exchange]
+    local = now.astimezone(calendar["tz"])
+    monday = local.date() - datetime.timedelta(days=local.weekday())
+    bounds = []
+    for week in (-1, 0, 1):
+        for day, start, end in calendar["sessions"]:
+            date = monday + datetime.timedelta(days=day + 7 * week)
+            session_end = datetime.datetime.combine(date, end, calendar["tz"])
+            if end == datetime.time.max:
+                session_end = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time.min, calendar["tz"])
+            bounds.append((datetime.datetime.combine(date, start, calendar["tz"]), session_end))
+    return sorted(bounds)
+
+
+def is_open(symbol, now=None):
+    now = _now(now)
+    return any(start <= now < end for start, end in _session_bounds(exchange_of(symbol), now))
+
+
+def next_open(symbol, now=None):
+    now = _now(now)
+    for start, end in _session_bounds(exchange_of(symbol), now):
+        if start <= now < end:
+            return now
+        if start > now:
+            return start
+    return now + datetime.timedelta(days=7)
+
+
+def last_session_end(symbol, now=None):
+    now = _now(now)
+    ends = [end for start, end in _session_bounds(exchange_of(symbol), now) if end <= now]
+    return ends[-1] if ends else None
+
+
+def cache_ttl(symbol, now=None):
+    # Seconds a quote for symbol stays fresh: LIVE_TTL while its market is
+    # open or just closed, otherwise until the market reopens
+    now = _now(now)
+    if is_open(symbol, now):
+        return LIVE_TTL
+    closed_at = last_session_end(symbol, now)
+    if closed_at is not None and now - closed_at < SETTLE_AFTER_CLOSE:
+        return LIVE_TTL
+    return max(LIVE_TTL, int((next_open(symbol, now) - now).total_seconds()))
+
+
+def refresh_interval(symbols, now=None):
+    # How often tiles showing symbols need to refresh
+    now = _now(now)
+    return min(cache_ttl(symbol, now) for symbol in symbols)
+
+
+def auto_refresh(symbols, render):
+    # Calls render() now and re-runs it on the markets' schedule: every
+    # LIVE_TTL seconds while any of them trades, otherwise at the next open.
+    # A full rerun is triggered when that state flips so the new interval
+    # takes effect.
+    symbols = list(symbols)
+    live = refresh_interval(symbols) == LIVE_TTL
+
+    @st.fragment(run_every=refresh_interval(symbols))
+    def tiles():
+        if (refresh_interval(symbols) == LIVE_TTL) != live:
+            st.rerun()
+        render()
+
+    tiles()
@@ -0,0 +1,228 @@
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Bounds the data this server process caches between reruns: the shared
+# caches (stale fallbacks, running summaries, indicator frames), and any
+# data a page keeps for its own session with session_put. Each entry is
+# stored with an estimate of its size.
+# When the total passes the budget, entries are evicted in order of idle
+# time x size, whichever session they belong to, so large cold frames go
+# before small hot ones. A background sweep drops a session's data once it
+# disconnects. Streamlit's own session state (widget values) is not
+# counted here.
+
+BUDGET_BYTES = int(float(os.environ.get("MEMORY_BUDGET_MB", 512)) * 1024 * 1024)
+SHARED = "shared"
+# Seconds between checks for disconnected sessions
+SWEEP_INTERVAL = 30
+# Containers nested deeper than this are counted by their own size only
+MAX_DEPTH = 6
+# Items measured per large container; the rest are assumed similar
+SAMPLE_ITEMS = 32
+
+
+def estimate_size(obj, depth=0):
+    # Approximate bytes held by obj, including what it references
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, "to_plotly_json"):
+        obj = obj.to_plotly_json()
+    size = sys.getsizeof(obj)
+    if depth >= MAX_DEPTH or isinstance(obj, (str, bytes, int, float)):
+        return size
+    if isinstance(obj, dict):
+        items = [item for pair in obj.items() for item in pair]
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        items = list(obj)
+    elif hasattr(obj, "__dict__"):
+        return size + estimate_size(vars(obj), depth + 1)
+    else:
+        return size
+    if len(items) > SAMPLE_ITEMS:
+        sample = items[:SAMPLE_ITEMS]
+        return size + sum(estimate_size(item, depth + 1) for item in sample) * len(items) // len(sample)
+    return size + sum(estimate_size(item, depth + 1) for item in items)
+
+
+def current_session():
+    # Id of the session running this script, or None outside a script run
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+
+def is_active_session(session_id):
+    if not runtime.exists():
+        return True
+    return runtime.get_instance().is_active_session(session_id)
+
+
+def process_rss():
+    # Resident set size of this process in bytes (peak RSS where /proc is
+    # not available)
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryBudget:
+    def __init__(self, limit=BUDGET_BYTES):
+        self.limit = limit
+        # (owner, namespace, key) -> [value, size, stored_at, used_at]
+        self.entries = {}
+        self.used = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, owner, namespace, key, max_age=None):
+        # Stored value, or None if absent, evicted or older than max_age
+        with self.lock:
+            entry = self.entries.get((owner, namespace, key))
+            if entry is None:
+                return None
+            now = time.monotonic()
+            if max_age is not None and now - entry[2] > max_age:
+                return None
+            entry[3] = now
+            return entry[0]
+
+    def put(self, owner, namespace, key, value, size=None):
+        # Size is measured outside the lock; it can walk large objects
+        size = estimate_size(value) if size is None else size
+        entry_key = (owner, namespace, key)
+        now = time.monotonic()
+        with self.lock:
+            self._remove(entry_key)
+            self.entries[entry_key] = [value, size, now, now]
+            self.used += size
+            self._evict(protect=entry_key)
+        return value
+
+    def discard(self, owner, namespace, key):
+        with self.lock:
+            self._remove((owner, namespace, key))
+
+    def release(self, owner):
+        # Drops everything stored for owner (a session id)
+        with self.lock:
+            for entry_key in [entry_key for entry_key in self.entries if entry_key[0] == owner]:
+                self._remove(entry_key)
+
+    def sweep(self):
+        # Releases the data of sessions that have disconnected
+        with self.lock:
+            owners = {owner for owner, _, _ in self.entries} - {SHARED}
+        for owner in owners:
+            if not is_active_session(owner):
+                self.release(owner)
+
+    def usage(self):
+        # (namespace, entries, bytes) rows, plus the number of sessions
+        # currently holding data
+        with self.lock:
+            rows = {}
+            for (owner, namespace, _), entry in self.entries.items():
+                count, size = rows.get(namespace, (0, 0))
+                rows[namespace] = (count + 1, size + entry[1])
+            sessions = len({owner for owner, _, _ in self.entries} - {SHARED})
+        return [(namespace, count, size) for namespace, (count, size) in sorted(rows.items())], sessions
+
+    def _remove(self, entry_key):
+        entry = self.entries.pop(entry_key, None)
+        if entry is not None:
+            self.used -= entry[1]
+
+    def _evict(self, protect):
+        if self.used <= self.limit:
+            return
+        now = time.monotonic()
+
+        def coldness(entry_key):
+            _, size, _, used_at = self.entries[entry_key]
+            return (now - used_at + 1) * size
+
+        for entry_key in sorted(self.entries, key=coldness, reverse=True):
+            if self.used <= self.limit:
+                break
+            if entry_key != protect:
+                self._remove(entry_key)
+                self.evictions += 1
+
+
+# One budget for the whole server process
+_budget = MemoryBudget()
+
+
+def _sweep_periodically():
+    # Sessions that disconnect while nothing is being stored are still
+    # released within SWEEP_INTERVAL
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        _budget.sweep()
+
+
+threading.Thread(target=_sweep_periodically, name="memory-sweep", daemon=True).start()
+
+
+def shared_get(namespace, key, max_age=None):
+    return _budget.get(SHARED, namespace, key, max_age)
+
+
+def shared_put(namespace, key, value, size=None):
+    return _budget.put(SHARED, namespace, key, value, size)
+
+
+def session_get(namespace, key, max_age=None):
+    # Value stored by the current session; outside a session this behaves
+    # like an empty store
+    session_id = current_session()
+    return None if session_id is None else _budget.get(session_id, namespace, key, max_age)
+
+
+def session_put(namespace, key, value, size=None):
+    session_id = current_session()
+    if session_id is None:
+        return value
+    return _budget.put(session_id, namespace, key, value, size)
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} GB"
+
+
+def usage_panel(container=None):
+    # Sidebar panel with what the budget currently holds
+    container = container or st.sidebar
+    rows, sessions = _budget.usage()
+    panel = container.expander("Server Memory")
+    panel.metric("Cached Data", format_bytes(_budget.used), f"of {format_bytes(_budget.limit)} budget", delta_color="off")
+    panel.caption(
+        f"Process RSS: {format_bytes(process_rss())} · Sessions holding data: {sessions} · "
+        f"Evictions: {_budget.evictions}"
+    )
+    if rows:
+        panel.dataframe(
+            pd.DataFrame(
+                [(namespace, count, format_bytes(size)) for namespace, count, size in rows],
+                columns=["Cache", "Entries", "Size"],
+            ),
+            hide_index=True,
+        )
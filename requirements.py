@@ -4,3 +4,4 @@ matplotlib
 appdirs
 yfinance
 plotly
+requests
@@ -0,0 +1,261 @@
+import concurrent.futures
+import contextlib
+import random
+import threading
+import time
+
+import requests
+import streamlit as st
+import yfinance as yf
+
+import shared_cache
+from market_hours import cache_ttl
+from memory_budget import shared_get, shared_put
+
+# Per-endpoint timeouts (seconds) for upstream calls
+ENDPOINT_TIMEOUTS = {
+    "history": 10,
+    "info": 10,
+    "worldbank": 15,
+    "news": 5,
+}
+
+# How long fetched data stays in the shared cache (seconds). Quotes follow
+# their exchange's trading hours instead (market_hours.cache_ttl), and
+# histories are kept at least until the market reopens. fetch_url reads
+# through the cache for the endpoints listed here.
+CACHE_TTLS = {
+    "history": 300,
+    "info": 3600,
+    "news": 300,
+}
+
+# Retry and circuit breaker settings
+MAX_RETRIES = 3
+BASE_DELAY = 0.5
+MAX_DELAY = 8.0
+FAILURE_THRESHOLD = 5
+RESET_AFTER = 60.0
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class NoDataError(UpstreamError):
+    # Upstream answered but had nothing for this key (unknown or delisted
+    # symbol). Not retried and not counted against the circuit breaker, so
+    # one bad symbol cannot trip the breaker for every other symbol.
+    pass
+
+
+class CircuitBreaker:
+    # Opens after FAILURE_THRESHOLD consecutive failures. Once RESET_AFTER
+    # seconds have passed it is half-open: a single probe call goes through
+    # while every other caller is still refused, and the probe's result
+    # closes or re-opens the breaker. A probe that never reports back is
+    # replaced after another RESET_AFTER seconds.
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_after=RESET_AFTER):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if self.probe_started is not None:
+                if now - self.probe_started < self.reset_after:
+                    return False
+            elif now - self.opened_at < self.reset_after:
+                return False
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probe_started is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+
+    def record_no_data(self):
+        # Upstream answered, just without data for the key: a probe has
+        # succeeded, but a closed breaker's failure count is left alone
+        with self.lock:
+            if self.probe_started is not None:
+                self.failures = 0
+                self.opened_at = None
+                self.probe_started = None
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+# yf.Ticker.info takes no timeout, so info requests run on this pool and
+# are abandoned once the endpoint's timeout passes. The pool bounds how
+# many hung requests can pile up.
+_info_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="info")
+
+# Module state lives for the whole server process, so it is shared by all
+# sessions and survives reruns. Last good values are kept in the memory
+# budget, which may evict cold ones.
+_breakers = {}
+_state_lock = threading.Lock()
+
+
+def get_breaker(endpoint):
+    with _state_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker()
+        return _breakers[endpoint]
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_upstream(endpoint, key, fn, retries=MAX_RETRIES):
+    # Calls fn(timeout) with retries and the endpoint's circuit breaker.
+    # Only these real upstream calls count towards the breaker. Raises
+    # UpstreamError when no value could be fetched.
+    breaker = get_breaker(endpoint)
+    timeout = ENDPOINT_TIMEOUTS.get(endpoint, 10)
+    error = None
+
+    for attempt in range(retries):
+        if not breaker.allow():
+            break
+        try:
+            value = fn(timeout)
+        except NoDataError as e:
+            breaker.record_no_data()
+            error = e
+            break
+        except Exception as e:
+            error = e
+            breaker.record_failure()
+            if attempt < retries - 1:
+                time.sleep(backoff_delay(attempt))
+            continue
+        breaker.record_success()
+        return value
+
+    if error is None:
+        raise UpstreamError(f"{endpoint} is unavailable (circuit open)")
+    if isinstance(error, UpstreamError):
+        raise error
+    raise UpstreamError(f"{endpoint} failed for {key}: {error}") from error
+
+
+def _with_stale(endpoint, key, call):
+    # Returns call(), remembering it as the last good value for (endpoint,
+    # key), or that last good value when call() raises UpstreamError
+    stale_key = (endpoint, key)
+    try:
+        value = call()
+    except UpstreamError:
+        stale = shared_get("stale", stale_key)
+        if stale is None:
+            raise
+        return stale
+    return shared_put("stale", stale_key, value)
+
+
+def guarded_call(endpoint, key, fn, retries=MAX_RETRIES):
+    # Uncached upstream call (see call_upstream) that falls back to the last
+    # good value for (endpoint, key) when upstream is unhealthy, and raises
+    # UpstreamError if there is none.
+    return _with_stale(endpoint, key, lambda: call_upstream(endpoint, key, fn, retries))
+
+
+def cached_call(endpoint, namespace, key, fn, ttl, shard_key=None):
+    # Reads (namespace, key) from the shared cache first, so a value filled
+    # by any worker is served even while the breaker is open. Only a miss
+    # calls fn(timeout) upstream through call_upstream. Falls back to the
+    # last good value like guarded_call.
+    return _with_stale(endpoint, key, lambda: shared_cache.get_or_load(
+        namespace, key, lambda: call_upstream(endpoint, key, fn), ttl, shard_key=shard_key))
+
+
+def fetch_history(symbol, ttl=None, **kwargs):
+    # Price history for a symbol, read through the shared cache. An empty
+    # frame is treated as a failure so that it never replaces good data.
+    def load(timeout):
+        data = yf.Ticker(symbol).history(timeout=timeout, **kwargs)
+        if data is None or data.empty:
+            raise NoDataError(f"No price data returned for {symbol}")
+        return data
+
+    if ttl is None:
+        ttl = cache_ttl(symbol) if "period" in kwargs else max(CACHE_TTLS["history"], cache_ttl(symbol))
+    key = (symbol, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+    return cached_call("history", "history", key, load, ttl, shard_key=symbol)
+
+
+def fetch_info(symbol):
+    # Company info dict for a symbol, or {} when it cannot be retrieved
+    def load(timeout):
+        future = _info_executor.submit(lambda: yf.Ticker(symbol).info)
+        try:
+            info = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise UpstreamError(f"Company info for {symbol} timed out after {timeout}s")
+        if not info:
+            raise NoDataError(f"No company info returned for {symbol}")
+        return info
+
+    try:
+        return cached_call("info", "info", symbol, load, CACHE_TTLS["info"], shard_key=symbol)
+    except UpstreamError:
+        return {}
+
+
+def fetch_url(endpoint, url, **kwargs):
+    # HTTP GET with the endpoint's timeout; non-2xx responses are failures
+    def load(timeout):
+        response = requests.get(url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    key = (url, tuple(sorted((k, repr(v)) for k, v in kwargs.items()))) if kwargs else url
+    if endpoint in CACHE_TTLS:
+        return cached_call(endpoint, endpoint, key, load, CACHE_TTLS[endpoint])
+    return guarded_call(endpoint, key, load)
+
+
+def last_close(symbol, period="1d"):
+    # Latest closing price for a symbol, or None when it cannot be retrieved
+    try:
+        data = fetch_history(symbol, period=period)
+    except UpstreamError:
+        return None
+    return data["Close"].iloc[-1]
+
+
+def format_price(price, prefix):
+    # prefix is the currency sign (see currency.CURRENCY_SYMBOLS)
+    return "N/A" if price is None else f"{prefix}{price:.2f}"
+
+
+@contextlib.contextmanager
+def section(title):
+    # Renders one page section; a failure inside it is reported in place
+    # instead of stopping the rest of the page.
+    try:
+        yield
+    except Exception as e:
+        st.warning(f"{title} is temporarily unavailable: {e}")
@@ -0,0 +1,149 @@
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Screens a large universe of symbols from a local snapshot of fundamentals
+# and quotes. The snapshot is loaded once into numpy columns; each filter
+# change is a handful of vectorized comparisons and a sort over those
+# arrays, with no network calls.
+#
+#   python screener.py build --symbols symbols_full.csv --out snapshot.parquet
+#
+# builds the snapshot (a .csv path works too when pyarrow is not installed).
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_PATH = os.environ.get("SCREENER_SNAPSHOT", os.path.join(HERE, "snapshot.parquet"))
+
+# Snapshot column -> yfinance info key
+INFO_FIELDS = {
+    "price": "regularMarketPrice",
+    "market_cap": "marketCap",
+    "trailing_pe": "trailingPE",
+    "forward_pe": "forwardPE",
+    "dividend_yield": "dividendYield",
+    "fifty_two_week_high": "fiftyTwoWeekHigh",
+    "fifty_two_week_low": "fiftyTwoWeekLow",
+    "volume": "volume",
+    "beta": "beta",
+}
+TEXT_COLUMNS = ["symbol", "name", "exchange", "currency", "sector"]
+
+# Filter operators over a numeric column
+OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+class Snapshot:
+    def __init__(self, frame):
+        frame = frame.reset_index(drop=True)
+        self.size = len(frame)
+        self.columns = {}
+        for column in TEXT_COLUMNS:
+            values = frame[column] if column in frame else pd.Series([""] * self.size)
+            self.columns[column] = values.fillna("").astype(str).to_numpy()
+        for column in INFO_FIELDS:
+            values = frame[column] if column in frame else pd.Series([np.nan] * self.size)
+            self.columns[column] = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+
+        # Derived columns
+        price = self.columns["price"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.columns["from_52w_high"] = price / self.columns["fifty_two_week_high"] - 1
+            self.columns["from_52w_low"] = price / self.columns["fifty_two_week_low"] - 1
+
+    @classmethod
+    def load(cls, path):
+        if path.endswith(".parquet"):
+            return cls(pd.read_parquet(path))
+        return cls(pd.read_csv(path))
+
+    def sectors(self):
+        return sorted(set(self.columns["sector"]) - {""})
+
+    def mask(self, filters=(), sectors=None):
+        # filters: (column, operator, value) triples, all of which must hold.
+        # Rows with a missing value in a filtered column never match.
+        mask = np.ones(self.size, dtype=bool)
+        for column, operator, value in filters:
+            with np.errstate(invalid="ignore"):
+                mask &= OPERATORS[operator](self.columns[column], value)
+        if sectors:
+            mask &= np.isin(self.columns["sector"], list(sectors))
+        return mask
+
+    def screen(self, filters=(), sectors=None, sort_by="market_cap", descending=True, page=0, page_size=50):
+        # Returns (one page of matching rows as a DataFrame, total matches)
+        rows = np.flatnonzero(self.mask(filters, sectors))
+        keys = self.columns[sort_by][rows]
+        if keys.dtype.kind == "f":
+            # Missing values sort last either way
+            order = np.argsort(np.where(np.isnan(keys), np.inf, -keys if descending else keys), kind="stable")
+        else:
+            order = np.argsort(keys, kind="stable")
+            if descending:
+                order = order[::-1]
+        selected = rows[order[page * page_size:(page + 1) * page_size]]
+        page_frame = pd.DataFrame({column: values[selected] for column, values in self.columns.items()})
+        return page_frame, len(rows)
+
+
+_snapshot = None
+_snapshot_mtime = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(path=SNAPSHOT_PATH):
+    # Snapshot shared by all sessions, reloaded when the file changes.
+    # Returns None when no snapshot has been built.
+    global _snapshot, _snapshot_mtime
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot_mtime != mtime:
+            _snapshot = Snapshot.load(path)
+            _snapshot_mtime = mtime
+        return _snapshot
+
+
+def build(symbols_path, out_path, workers=16):
+    # Fetches company info for every symbol in symbols_path (symbol index
+    # CSV layout) and writes the snapshot. Runs offline from the pages.
+    from resilience import fetch_info
+
+    listing = pd.read_csv(symbols_path, dtype=str).fillna("")
+
+    def snapshot_row(record):
+        info = fetch_info(record["symbol"])
+        row = {column: record.get(column, "") for column in TEXT_COLUMNS}
+        row["sector"] = info.get("sector", "")
+        for column, key in INFO_FIELDS.items():
+            row[column] = info.get(key)
+        return row
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(snapshot_row, listing.to_dict("records")))
+    frame = pd.DataFrame(rows)
+    if out_path.endswith(".parquet"):
+        frame.to_parquet(out_path, index=False)
+    else:
+        frame.to_csv(out_path, index=False)
+    return len(frame)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the screener snapshot.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--symbols", default=os.path.join(HERE, "symbols.csv"))
+    parser.add_argument("--out", default=SNAPSHOT_PATH)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+    print(f"Wrote {build(args.symbols, args.out, args.workers)} rows to {args.out}")
@@ -0,0 +1,128 @@
+# Runs several Streamlit workers for one page behind a local TCP load
+# balancer. All workers share the data cache in shared_cache.py, so adding
+# a worker adds capacity without adding upstream requests.
+#
+#   python serve.py app3.py --workers 4 --port 8501
+#   python serve.py app3.py --workers 4 --cache-backend redis --redis-urls redis://localhost:6379/0
+import argparse
+import asyncio
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import zlib
+
+import shared_cache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a Streamlit page on several workers behind a load balancer.")
+    parser.add_argument("page", help="Streamlit script to serve, e.g. app3.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8501, help="Port the load balancer listens on")
+    parser.add_argument("--worker-port", type=int, default=8601, help="Port of the first worker")
+    parser.add_argument("--balance", choices=["least-conn", "ip-hash"], default="ip-hash",
+                        help="ip-hash keeps each browser on one worker (needed for st.image/st.download_button media)")
+    parser.add_argument("--cache-backend", choices=["sqlite", "redis"], default="sqlite")
+    parser.add_argument("--cache-dir", default=shared_cache.DEFAULT_DIR)
+    parser.add_argument("--cache-shards", type=int, default=shared_cache.DEFAULT_SHARDS)
+    parser.add_argument("--redis-urls", default="redis://localhost:6379/0",
+                        help="Comma-separated Redis URLs, one per shard")
+    return parser.parse_args()
+
+
+def start_workers(args):
+    env = dict(os.environ)
+    env["CACHE_BACKEND"] = args.cache_backend
+    env["CACHE_DIR"] = args.cache_dir
+    env["CACHE_SHARDS"] = str(args.cache_shards)
+    env["CACHE_REDIS_URLS"] = args.redis_urls
+
+    workers = []
+    for i in range(args.workers):
+        port = args.worker_port + i
+        process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", args.page,
+             "--server.address", "127.0.0.1",
+             "--server.port", str(port),
+             "--server.headless", "true"],
+            env=env,
+        )
+        workers.append({"port": port, "process": process, "active": 0})
+    return workers
+
+
+async def pipe(reader, writer):
+    try:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+def pick_workers(workers, balance, client_host, rotation):
+    # Candidates in preference order; later ones are fallbacks if the first
+    # worker refuses the connection (still starting or crashed).
+    if balance == "ip-hash":
+        first = zlib.crc32(client_host.encode("utf-8")) % len(workers)
+    else:
+        lowest = min(worker["active"] for worker in workers)
+        tied = [i for i, worker in enumerate(workers) if worker["active"] == lowest]
+        first = tied[next(rotation) % len(tied)]
+    return workers[first:] + workers[:first]
+
+
+async def run_balancer(args, workers):
+    rotation = itertools.count()
+
+    async def handle(client_reader, client_writer):
+        client_host = client_writer.get_extra_info("peername")[0]
+        for worker in pick_workers(workers, args.balance, client_host, rotation):
+            if worker["process"].poll() is not None:
+                continue
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker["port"])
+            except OSError:
+                continue
+            worker["active"] += 1
+            try:
+                await asyncio.gather(
+                    pipe(client_reader, upstream_writer),
+                    pipe(upstream_reader, client_writer),
+                )
+            finally:
+                worker["active"] -= 1
+            return
+        client_writer.close()
+
+    server = await asyncio.start_server(handle, args.host, args.port)
+    print(f"Serving {args.page} on http://{args.host}:{args.port} with {len(workers)} workers "
+          f"({args.cache_backend} cache)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    args = parse_args()
+    workers = start_workers(args)
+    try:
+        asyncio.run(run_balancer(args, workers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker["process"].send_signal(signal.SIGTERM)
+        for worker in workers:
+            worker["process"].wait()
+
+
+if __name__ == "__main__":
+    main()
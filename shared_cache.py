@@ -0,0 +1,225 @@
+import contextlib
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+import zlib
+
+import appdirs
+
+# Data cache shared by every Streamlit worker on the host. Entries are
+# sharded by symbol so that writers for different symbols do not contend
+# on the same SQLite file (or Redis node), and each key is filled by one
+# worker at a time so concurrent misses do not all go upstream.
+#
+# Configuration (environment variables, set by serve.py for its workers):
+#   CACHE_BACKEND     "sqlite" (default) or "redis"
+#   CACHE_DIR         directory for the SQLite shard files (default: this
+#                     user's cache directory)
+#   CACHE_SHARDS      number of SQLite shards (default 8)
+#   CACHE_REDIS_URLS  comma-separated Redis URLs, one per shard. Any server
+#                     speaking the Redis protocol works; "fakeredis://" uses
+#                     an in-process fakeredis stand-in.
+
+# Entries are pickled, so whoever can write the shard files can run code in
+# every worker; the directory must be private to the user running them
+DEFAULT_DIR = appdirs.user_cache_dir("streamlit-dam")
+DEFAULT_SHARDS = 8
+
+# How long a worker may hold the fill lock for a key, and how often the
+# other workers poll for the value while they wait.
+LOCK_LEASE = 30.0
+LOCK_POLL = 0.05
+# How often each worker deletes expired rows from a SQLite shard
+PURGE_INTERVAL = 300.0
+
+
+def private_dir(directory):
+    # Creates directory readable only by this user, or checks that an
+    # existing one is this user's own (not a symlink) and tightens it
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {directory} is not a directory owned by this user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+    return directory
+
+
+def shard_for(shard_key, shards):
+    # Stable across processes, unlike hash()
+    return zlib.crc32(str(shard_key).encode("utf-8")) % shards
+
+
+class SQLiteBackend:
+    def __init__(self, directory=DEFAULT_DIR, shards=DEFAULT_SHARDS):
+        private_dir(directory)
+        self.paths = [os.path.join(directory, f"cache-{i}.sqlite") for i in range(shards)]
+        self.local = threading.local()
+        self.purged_at = [time.monotonic()] * shards
+        for i in range(shards):
+            with self.connect(i) as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, expires REAL)")
+
+    @property
+    def shards(self):
+        return len(self.paths)
+
+    def connect(self, shard):
+        # One connection per thread and shard; WAL lets readers in other
+        # workers proceed while one worker writes.
+        conns = getattr(self.local, "conns", None)
+        if conns is None:
+            conns = self.local.conns = {}
+        if shard not in conns:
+            conn = sqlite3.connect(self.paths[shard], timeout=LOCK_LEASE)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conns[shard] = conn
+        return conns[shard]
+
+    def get(self, shard, key):
+        row = self.connect(shard).execute(
+            "SELECT value FROM entries WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, shard, key, value, ttl):
+        now = time.time()
+        with self.connect(shard) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+        if time.monotonic() - self.purged_at[shard] > PURGE_INTERVAL:
+            self.purge(shard, now)
+
+    def purge(self, shard, now=None):
+        # Deletes expired entries and lock leases, which are otherwise only
+        # ever overwritten, so the shard files stop growing
+        now = time.time() if now is None else now
+        self.purged_at[shard] = time.monotonic()
+        with self.connect(shard) as conn:
+            conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+            conn.execute("DELETE FROM locks WHERE expires <= ?", (now,))
+
+    def acquire(self, shard, key, lease):
+        now = time.time()
+        with self.connect(shard) as conn:
+            conn.execute("DELETE FROM locks WHERE key = ? AND expires <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO locks (key, expires) VALUES (?, ?)", (key, now + lease)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, shard, key):
+        with self.connect(shard) as conn:
+            conn.execute("DELETE FROM locks WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    def __init__(self, urls):
+        clients = []
+        for url in urls:
+            if url.startswith("fakeredis://"):
+                import fakeredis
+                clients.append(fakeredis.FakeRedis())
+            else:
+                import redis
+                clients.append(redis.Redis.from_url(url))
+        self.clients = clients
+
+    @property
+    def shards(self):
+        return len(self.clients)
+
+    def get(self, shard, key):
+        return self.clients[shard].get(key)
+
+    def set(self, shard, key, value, ttl):
+        self.clients[shard].set(key, value, px=int(ttl * 1000))
+
+    def acquire(self, shard, key, lease):
+        return bool(self.clients[shard].set("lock:" + key, b"1", nx=True, px=int(lease * 1000)))
+
+    def release(self, shard, key):
+        self.clients[shard].delete("lock:" + key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+# Cache key -> [lock, number of threads using it]; entries are removed when
+# the last user leaves, so this only holds keys being read right now
+_key_locks = {}
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if os.environ.get("CACHE_BACKEND", "sqlite") == "redis":
+                urls = os.environ.get("CACHE_REDIS_URLS", "redis://localhost:6379/0").split(",")
+                _backend = RedisBackend([url.strip() for url in urls if url.strip()])
+            else:
+                _backend = SQLiteBackend(
+                    os.environ.get("CACHE_DIR", DEFAULT_DIR),
+                    int(os.environ.get("CACHE_SHARDS", DEFAULT_SHARDS)),
+                )
+        return _backend
+
+
+@contextlib.contextmanager
+def _key_lock(key):
+    with _backend_lock:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _backend_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _key_locks[key]
+
+
+def get_or_load(namespace, key, loader, ttl, shard_key=None):
+    # Returns the cached value for (namespace, key), calling loader() to fill
+    # it on a miss. Only one thread per worker, and one worker per host,
+    # runs the loader for a given key; the others wait for its result.
+    backend = get_backend()
+    cache_key = f"{namespace}:{key!r}"
+    shard = shard_for(key if shard_key is None else shard_key, backend.shards)
+
+    with _key_lock(cache_key):
+        cached = backend.get(shard, cache_key)
+        if cached is not None:
+            return pickle.loads(cached)
+
+        deadline = time.monotonic() + LOCK_LEASE
+        locked = backend.acquire(shard, cache_key, LOCK_LEASE)
+        while not locked:
+            # Another worker is filling this key
+            time.sleep(LOCK_POLL)
+            cached = backend.get(shard, cache_key)
+            if cached is not None:
+                return pickle.loads(cached)
+            if time.monotonic() >= deadline:
+                # The holder is stuck; load without the lock
+                break
+            locked = backend.acquire(shard, cache_key, LOCK_LEASE)
+
+        try:
+            # It may have been filled between our last check and the lock
+            cached = backend.get(shard, cache_key)
+            if cached is not None:
+                return pickle.loads(cached)
+            value = loader()
+            backend.set(shard, cache_key, pickle.dumps(value), ttl)
+            return value
+        finally:
+            if locked:
+                backend.release(shard, cache_key)
@@ -0,0 +1,243 @@
+import datetime
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+
+# Offline stand-ins for every upstream the pages call: Yahoo Finance
+# (yf.Ticker and yf.download), the World Bank API and the news page. Data
+# is synthetic but stable per symbol, so repeated calls agree the way the
+# real services do. Each call sleeps for a simulated network latency and is
+# counted by endpoint, so a test can see how many upstream calls its
+# reruns caused.
+#
+#   stubs = StubProviders(latency=0.05)
+#   with stubs:
+#       ...  # yf.Ticker, yf.download and requests.get are stubbed here
+#   stubs.calls  # Counter of upstream calls by endpoint
+
+LATENCY = 0.05
+FIRST_DATE = "2000-01-03"
+TIMEZONE = "America/New_York"
+
+# Bar rule per yfinance interval
+INTERVAL_RULES = {"5d": "5B", "1wk": "W-FRI", "1mo": "BME", "3mo": "BQE"}
+# Trading days per yfinance period
+PERIOD_ROWS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260, "10y": 2520}
+BAR = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+SECTORS = ["Technology", "Healthcare", "Financial Services", "Energy", "Consumer Cyclical", "Industrials"]
+
+# World Bank country list; "WLD" is an aggregate
+COUNTRIES = {
+    "USA": "United States", "CHN": "China", "JPN": "Japan", "DEU": "Germany", "FRA": "France",
+    "GBR": "United Kingdom", "BRA": "Brazil", "MEX": "Mexico", "IND": "India", "CAN": "Canada",
+    "ITA": "Italy", "KOR": "Korea, Rep.", "AUS": "Australia", "ESP": "Spain", "IDN": "Indonesia",
+    "NLD": "Netherlands", "SAU": "Saudi Arabia", "TUR": "Turkiye", "CHE": "Switzerland", "ZAF": "South Africa",
+}
+AGGREGATES = {"WLD": "World"}
+
+# A slice of the World Bank indicator catalog; unit is mostly empty there
+CATALOG = {
+    "NY.GDP.MKTP.CD": "GDP (current US$)",
+    "NY.GDP.PCAP.CD": "GDP per capita (current US$)",
+    "NY.GDP.MKTP.KD.ZG": "GDP growth (annual %)",
+    "SP.POP.TOTL": "Population, total",
+    "FP.CPI.TOTL.ZG": "Inflation, consumer prices (annual %)",
+    "SL.UEM.TOTL.ZS": "Unemployment, total (% of total labor force) (modeled ILO estimate)",
+    "NE.EXP.GNFS.ZS": "Exports of goods and services (% of GDP)",
+    "NE.IMP.GNFS.ZS": "Imports of goods and services (% of GDP)",
+    "GC.DOD.TOTL.GD.ZS": "Central government debt, total (% of GDP)",
+    "BN.CAB.XOKA.CD": "Current account balance (BoP, current US$)",
+    "EN.ATM.CO2E.KT": "CO2 emissions (kt)",
+    "SP.DYN.LE00.IN": "Life expectancy at birth, total (years)",
+    "SE.XPD.TOTL.GD.ZS": "Government expenditure on education, total (% of GDP)",
+    "EG.ELC.ACCS.ZS": "Access to electricity (% of population)",
+}
+
+NEWS_HEADLINES = [
+    "Stocks edge higher as investors weigh rate outlook",
+    "Oil slips on demand worries",
+    "Tech shares lead the market rebound",
+    "Dollar steadies ahead of jobs data",
+    "Treasury yields fall after inflation report",
+]
+
+
+def _seed(*parts):
+    return zlib.crc32("|".join(map(str, parts)).encode("utf-8"))
+
+
+def _timestamp(value):
+    stamp = pd.Timestamp(value)
+    return stamp.tz_localize(TIMEZONE) if stamp.tz is None else stamp.tz_convert(TIMEZONE)
+
+
+class StubProviders:
+    def __init__(self, latency=LATENCY, seed=0):
+        self.latency = latency
+        self.seed = seed
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.originals = None
+        self.prices = {}
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def install(self):
+        # Patches the providers process-wide; pages and helpers pick the
+        # stubs up through their module attributes
+        stubs = self
+
+        class Ticker:
+            def __init__(self, symbol):
+                self.ticker = symbol
+
+            def history(self, **kwargs):
+                return stubs.history(self.ticker, **kwargs)
+
+            @property
+            def info(self):
+                return stubs.info(self.ticker)
+
+        self.originals = (yf.Ticker, yf.download, requests.get)
+        yf.Ticker = Ticker
+        yf.download = self.download
+        requests.get = self.get
+
+    def uninstall(self):
+        if self.originals is not None:
+            yf.Ticker, yf.download, requests.get = self.originals
+            self.originals = None
+
+    def _upstream(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] += 1
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+    def _daily(self, symbol):
+        # Daily bars from FIRST_DATE to today, generated once per symbol
+        with self.lock:
+            if symbol not in self.prices:
+                index = pd.bdate_range(FIRST_DATE, datetime.date.today(), tz=TIMEZONE)
+                rng = np.random.default_rng(_seed(self.seed, symbol))
+                close = (20 + rng.random() * 300) * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(index))))
+                spread = close * rng.uniform(0.002, 0.02, len(index))
+                self.prices[symbol] = pd.DataFrame({
+                    "Open": close + rng.normal(0, 0.5, len(index)) * spread,
+                    "High": close + spread,
+                    "Low": close - spread,
+                    "Close": close,
+                    "Volume": rng.integers(100_000, 50_000_000, len(index)).astype(float),
+                }, index=index)
+            return self.prices[symbol]
+
+    def _bars(self, symbol, start=None, end=None, period=None, interval="1d"):
+        daily = self._daily(symbol)
+        if period in PERIOD_ROWS:
+            data = daily.iloc[-PERIOD_ROWS[period]:]
+        elif period == "ytd":
+            data = daily[daily.index.year == daily.index[-1].year]
+        elif start is not None or end is not None:
+            # end is exclusive, as in yfinance
+            data = daily
+            if start is not None:
+                data = data[data.index >= _timestamp(start)]
+            if end is not None:
+                data = data[data.index < _timestamp(end)]
+        else:
+            data = daily.iloc[-PERIOD_ROWS["1mo"]:]
+        if interval in INTERVAL_RULES and not data.empty:
+            data = data.resample(INTERVAL_RULES[interval]).agg(BAR).dropna()
+        return data.copy()
+
+    def history(self, symbol, start=None, end=None, period=None, interval="1d", **kwargs):
+        self._upstream("history")
+        return self._bars(symbol, start, end, period, interval)
+
+    def info(self, symbol):
+        self._upstream("info")
+        daily = self._daily(symbol)
+        rng = random.Random(_seed(self.seed, symbol, "info"))
+        price = float(daily["Close"].iloc[-1])
+        year = daily["Close"].iloc[-252:]
+        return {
+            "symbol": symbol,
+            "longName": f"{symbol} Holdings",
+            "sector": rng.choice(SECTORS),
+            "industry": "Diversified",
+            "country": "United States",
+            "currentPrice": price,
+            "regularMarketPrice": price,
+            "marketCap": int(price * rng.uniform(1e8, 1e10)),
+            "trailingPE": rng.uniform(5, 60),
+            "forwardPE": rng.uniform(5, 50),
+            "dividendYield": rng.uniform(0, 0.05),
+            "beta": rng.uniform(0.4, 2.0),
+            "fiftyTwoWeekHigh": float(year.max()),
+            "fiftyTwoWeekLow": float(year.min()),
+            "volume": int(daily["Volume"].iloc[-1]),
+        }
+
+    def download(self, tickers, start=None, end=None, period=None, interval="1d", **kwargs):
+        # One request for all tickers, columns (field, ticker) like yfinance
+        self._upstream("download")
+        tickers = tickers.split() if isinstance(tickers, str) else list(tickers)
+        frames = {ticker: self._bars(ticker, start, end, period, interval) for ticker in tickers}
+        data = pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+        data.index = data.index.tz_localize(None)
+        return data
+
+    def get(self, url, timeout=None, **kwargs):
+        parts = urlsplit(url)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        if parts.netloc == "api.worldbank.org":
+            self._upstream("worldbank")
+            body = json.dumps(self._world_bank(parts.path, params))
+        else:
+            self._upstream("news")
+            body = "<html><body>" + "".join(
+                f'<h3 class="Mb(5px)"><a href="/news/story-{i}">{headline}</a></h3>'
+                for i, headline in enumerate(NEWS_HEADLINES)
+            ) + "</body></html>"
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.encoding = "utf-8"
+        response._content = body.encode("utf-8")
+        return response
+
+    def _world_bank(self, path, params):
+        meta = {"page": 1, "pages": 1}
+        if path.rstrip("/").endswith("/country"):
+            rows = [{"id": code, "name": name, "region": {"value": "Aggregates" if code in AGGREGATES else "Other"}}
+                    for code, name in {**COUNTRIES, **AGGREGATES}.items()]
+            return [meta, rows]
+        if path.rstrip("/").endswith("/indicator"):
+            return [meta, [{"id": code, "name": name, "unit": ""} for code, name in CATALOG.items()]]
+        indicator = path.rstrip("/").rsplit("/", 1)[-1]
+        first, last = (int(year) for year in params.get("date", "1960:2024").split(":"))
+        last = min(last, datetime.date.today().year - 1)
+        years = np.arange(1960, last + 1)
+        rows = []
+        for code in {**COUNTRIES, **AGGREGATES}:
+            # Whole series from 1960, so any date window returns the same values
+            rng = np.random.default_rng(_seed(self.seed, indicator, code))
+            values = rng.uniform(1, 100) * 1.03 ** (years - 1960) * rng.uniform(0.95, 1.05, len(years))
+            rows.extend({"countryiso3code": code, "date": str(year), "value": float(value)}
+                        for year, value in zip(years, values) if year >= first)
+        return [meta, rows]
@@ -0,0 +1,327 @@
+import copy
+import math
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from memory_budget import shared_get, shared_put
+
+# Running summary statistics for fetched price histories. Each history is
+# folded into its aggregates once; a rerun only pays for the rows appended
+# since the last one, instead of rescanning the frame with describe() and
+# rolling().
+#
+# The newest row of a history is still changing while its market is open,
+# so it is never committed to the aggregates. It is merged into a copy at
+# read time instead, which costs O(columns).
+#
+# Quartiles are P² estimates rather than exact order statistics, so
+# describe() labels them "~25%", "~50%" and "~75%".
+
+QUANTILES = (0.25, 0.5, 0.75)
+DESCRIBE_ROWS = ["count", "mean", "std", "min", "~25%", "~50%", "~75%", "max"]
+PERIODS_PER_YEAR = 252
+RANGE_WINDOW = pd.Timedelta(days=365)
+
+
+class P2Quantile:
+    # Streaming quantile estimate in O(1) memory (Jain & Chlamtac's P²)
+    def __init__(self, p):
+        self.p = p
+        self.initial = []
+        self.heights = None
+        self.positions = None
+        self.desired = None
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x):
+        if self.heights is None:
+            self.initial.append(x)
+            if len(self.initial) == 5:
+                self.heights = sorted(self.initial)
+                self.positions = [0, 1, 2, 3, 4]
+                p = self.p
+                self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+            return
+
+        q, n = self.heights, self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def value(self):
+        if self.heights is None:
+            if not self.initial:
+                return math.nan
+            return float(np.quantile(self.initial, self.p))
+        return self.heights[2]
+
+
+class RunningStats:
+    # count/mean/variance (Welford, merged per batch), min/max and quantiles
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = {p: P2Quantile(p) for p in QUANTILES}
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        batch_count = len(values)
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+
+        total = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.mean += delta * batch_count / total
+        self.m2 += batch_m2 + delta ** 2 * self.count * batch_count / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        for value in values:
+            for estimator in self.quantiles.values():
+                estimator.add(value)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def describe(self):
+        if not self.count:
+            return [0] + [math.nan] * 7
+        return [self.count, self.mean, self.std, self.min,
+                *(self.quantiles[p].value() for p in QUANTILES), self.max]
+
+
+class SeriesSummary:
+    def __init__(self, frame):
+        self.columns = list(frame.select_dtypes("number").columns)
+        self.first_index = frame.index[0]
+        self.last_index = None
+        self.committed = 0
+        self.stats = {column: RunningStats() for column in self.columns}
+        self.returns = RunningStats()
+        self.first_close = None
+        self.last_close = None
+        self.peak = -math.inf
+        self.max_drawdown = 0.0
+        # Monotonic (timestamp, value) deques for the trailing 52-week range
+        self.highs = deque()
+        self.lows = deque()
+        self.rolling = {}
+        self.pending = None
+        self.pending_index = None
+        # Last committed row, to notice when the history has been rewritten
+        self.last_row = None
+        # Held by update() and every read, since sessions share summaries
+        self.lock = threading.RLock()
+
+    def matches(self, frame):
+        # Whether frame extends the history folded in so far. Adjusted
+        # prices are rescaled after a dividend or split, which changes the
+        # last committed row, and then the summary has to be rebuilt.
+        if (
+            frame.empty
+            or frame.index[0] != self.first_index
+            or list(frame.select_dtypes("number").columns) != self.columns
+        ):
+            return False
+        if self.last_index is None:
+            return True
+        if self.last_index >= frame.index[-1] or self.last_index not in frame.index:
+            return False
+        row = frame.loc[self.last_index, self.columns].to_numpy(dtype=float)
+        return np.allclose(row, self.last_row, rtol=1e-9, atol=0, equal_nan=True)
+
+    def is_ahead_of(self, frame):
+        # Whether rows past the end of frame are already committed (another
+        # session has fetched a newer copy of the same history)
+        return (
+            self.last_index is not None
+            and not frame.empty
+            and frame.index[0] == self.first_index
+            and frame.index[-1] <= self.last_index
+        )
+
+    def update(self, frame):
+        with self.lock:
+            self._update(frame)
+
+    def _update(self, frame):
+        start = 0 if self.last_index is None else frame.index.searchsorted(self.last_index, side="right")
+        rows = frame.iloc[start:-1]
+        if len(rows):
+            self._commit(rows)
+        self.pending = frame.iloc[-1]
+        self.pending_index = frame.index[-1]
+
+    def _commit(self, rows):
+        for column in self.columns:
+            self.stats[column].update(rows[column].to_numpy(dtype=float))
+
+        if "Close" in rows:
+            closes = rows["Close"].to_numpy(dtype=float)
+            previous = [] if self.last_close is None else [self.last_close]
+            series = np.concatenate([previous, closes])
+            if len(series) > 1:
+                self.returns.update(series[1:] / series[:-1] - 1)
+            peaks = np.maximum.accumulate(np.concatenate([[self.peak], closes]))[1:]
+            self.max_drawdown = min(self.max_drawdown, float((closes / peaks - 1).min()))
+            self.peak = float(peaks[-1])
+            if self.first_close is None:
+                self.first_close = float(closes[0])
+            self.last_close = float(closes[-1])
+
+            highs = rows["High"] if "High" in rows else rows["Close"]
+            lows = rows["Low"] if "Low" in rows else rows["Close"]
+            for timestamp, high, low in zip(rows.index, highs, lows):
+                while self.highs and self.highs[-1][1] <= high:
+                    self.highs.pop()
+                self.highs.append((timestamp, high))
+                while self.lows and self.lows[-1][1] >= low:
+                    self.lows.pop()
+                self.lows.append((timestamp, low))
+                while self.highs[0][0] < timestamp - RANGE_WINDOW:
+                    self.highs.popleft()
+                while self.lows[0][0] < timestamp - RANGE_WINDOW:
+                    self.lows.popleft()
+
+        for window, state in self.rolling.items():
+            self._extend_rolling(window, state, rows["Close"].to_numpy(dtype=float))
+
+        self.last_index = rows.index[-1]
+        self.last_row = rows[self.columns].iloc[-1].to_numpy(dtype=float)
+        self.committed += len(rows)
+
+    def describe(self):
+        # Same layout as DataFrame.describe(), with approximate quartiles
+        with self.lock:
+            return self._describe()
+
+    def _describe(self):
+        result = {}
+        for column in self.columns:
+            stats = copy.deepcopy(self.stats[column])
+            stats.update([self.pending[column]])
+            result[column] = stats.describe()
+        return pd.DataFrame(result, index=DESCRIBE_ROWS)
+
+    def performance(self, periods_per_year=PERIODS_PER_YEAR):
+        with self.lock:
+            return self._performance(periods_per_year)
+
+    def _performance(self, periods_per_year):
+        close = float(self.pending["Close"])
+        returns = copy.deepcopy(self.returns)
+        if self.last_close is not None:
+            returns.update([close / self.last_close - 1])
+        first_close = close if self.first_close is None else self.first_close
+        peak = max(self.peak, close)
+
+        cutoff = self.pending_index - RANGE_WINDOW
+        high = self.pending["High"] if "High" in self.pending else close
+        low = self.pending["Low"] if "Low" in self.pending else close
+        high = max([high] + [value for timestamp, value in self.highs if timestamp >= cutoff][:1])
+        low = min([low] + [value for timestamp, value in self.lows if timestamp >= cutoff][:1])
+
+        return pd.Series({
+            "Total Return": close / first_close - 1,
+            "Mean Return": returns.mean if returns.count else math.nan,
+            "Annualized Volatility": returns.std * math.sqrt(periods_per_year),
+            "Max Drawdown": min(self.max_drawdown, close / peak - 1),
+            "52-Week High": high,
+            "52-Week Low": low,
+        })
+
+    def rolling_mean(self, frame, window):
+        # Equivalent to frame["Close"].rolling(window).mean(). The first call
+        # for a window replays the committed closes; later calls only pay
+        # for new rows.
+        with self.lock:
+            return self._rolling_mean(frame, window)
+
+    def _rolling_mean(self, frame, window):
+        if len(frame) <= self.committed:
+            # Another session has advanced the summary past this frame
+            # since it was summarized; its rows are all committed
+            if window in self.rolling:
+                return pd.Series(self.rolling[window]["means"][:len(frame)], index=frame.index)
+            return frame["Close"].rolling(window).mean()
+        if window not in self.rolling:
+            state = self.rolling[window] = {"values": deque(), "sum": 0.0, "means": []}
+            closes = frame["Close"].iloc[:self.committed].to_numpy(dtype=float)
+            self._extend_rolling(window, state, closes)
+        state = self.rolling[window]
+
+        close = float(self.pending["Close"])
+        values = state["values"]
+        if len(values) + 1 >= window:
+            oldest = values[0] if len(values) == window else 0.0
+            latest = (state["sum"] + close - oldest) / window
+        else:
+            latest = math.nan
+        return pd.Series(state["means"] + [latest], index=frame.index)
+
+    def _extend_rolling(self, window, state, closes):
+        values = state["values"]
+        for close in closes:
+            values.append(close)
+            state["sum"] += close
+            if len(values) > window:
+                state["sum"] -= values.popleft()
+            state["means"].append(state["sum"] / window if len(values) == window else math.nan)
+
+
+_lock = threading.Lock()
+
+
+def summarize(key, frame):
+    # Summary for the history identified by key (e.g. symbol, start date and
+    # interval), brought up to date with any rows appended to frame. Kept in
+    # the memory budget; an evicted summary is rebuilt from the frame. Keys
+    # should include the end date, so that only sessions asking for the
+    # same range share a summary.
+    with _lock:
+        summary = shared_get("summary", key)
+        if summary is None or not summary.is_ahead_of(frame):
+            if summary is None or not summary.matches(frame):
+                summary = SeriesSummary(frame)
+            summary.update(frame)
+            return shared_put("summary", key, summary)
+    # This session holds an older copy of the history than the shared
+    # summary; summarize it on its own rather than rewinding the shared one
+    summary = SeriesSummary(frame)
+    summary.update(frame)
+    return summary
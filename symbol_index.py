@@ -0,0 +1,225 @@
+import bisect
+import csv
+import difflib
+import functools
+import io
+import os
+import re
+import sys
+import threading
+
+import streamlit as st
+
+# Local index of known ticker symbols, used to validate and autocomplete
+# ticker input before anything is sent to Yahoo.
+#
+# symbols.csv is a small checked-in list covering the symbols these pages
+# use. `python symbol_index.py download` writes symbols_full.csv with every
+# NASDAQ/NYSE-listed security merged with it; when present it is preferred.
+# Only the full index is complete enough to reject unknown symbols, and
+# only plain US tickers, since that is all it lists in full. Anything else
+# (and anything with the small list) is flagged but still fetched.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_PATH = os.path.join(HERE, "symbols.csv")
+FULL_PATH = os.path.join(HERE, "symbols_full.csv")
+
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+OTHER_EXCHANGES = {"A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+
+FIELDS = ["symbol", "name", "exchange", "currency"]
+# What the NASDAQ Trader directory lists in full: a US ticker with an
+# optional share class or preferred series (BRK-B, ABC-PA). Indices (^),
+# FX (=X), futures (=F), crypto (-USD) and non-US listings (.T, .DE) do
+# not match.
+US_TICKER = re.compile(r"[A-Z]{1,5}(-[A-Z]{1,2})?")
+SUGGESTIONS = 8
+
+
+class SymbolIndex:
+    def __init__(self, records, is_full=False):
+        self.is_full = is_full
+        self.records = {record["symbol"].upper(): record for record in records}
+        # Sorted (key, symbol) pairs; a prefix search is a bisect plus a
+        # short forward scan.
+        self.symbol_keys = sorted(self.records)
+        self.word_keys = sorted(
+            (word, symbol)
+            for symbol, record in self.records.items()
+            for word in record["name"].lower().replace(",", " ").split()
+        )
+        self.names = {record["name"].lower(): symbol for symbol, record in self.records.items()}
+
+    @classmethod
+    def from_csv(cls, path, is_full=False):
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(list(csv.DictReader(f)), is_full)
+
+    def __len__(self):
+        return len(self.records)
+
+    def lookup(self, symbol):
+        return self.records.get(symbol.strip().upper())
+
+    def complete(self, prefix, limit=10):
+        # Symbols starting with prefix, shortest first
+        prefix = prefix.strip().upper()
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.symbol_keys, prefix)
+        matches = []
+        for symbol in self.symbol_keys[start:]:
+            if not symbol.startswith(prefix):
+                break
+            matches.append(symbol)
+        matches.sort(key=len)
+        return [self.records[symbol] for symbol in matches[:limit]]
+
+    def search(self, text, limit=10):
+        # Symbol prefix matches, then company-name word prefix matches, then
+        # fuzzy matches on symbols and names for typos
+        text = text.strip()
+        if not text:
+            return []
+        found = [record["symbol"] for record in self.complete(text, limit)]
+
+        word = text.lower()
+        start = bisect.bisect_left(self.word_keys, (word, ""))
+        for key, symbol in self.word_keys[start:]:
+            if len(found) >= limit or not key.startswith(word):
+                break
+            if symbol not in found:
+                found.append(symbol)
+
+        if len(found) < limit:
+            for match in difflib.get_close_matches(text.upper(), self.symbol_keys, n=limit, cutoff=0.6):
+                if match not in found:
+                    found.append(match)
+            for match in difflib.get_close_matches(word, list(self.names), n=limit, cutoff=0.6):
+                if self.names[match] not in found:
+                    found.append(self.names[match])
+        return [self.records[symbol] for symbol in found[:limit]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            if os.path.exists(FULL_PATH):
+                _index = SymbolIndex.from_csv(FULL_PATH, is_full=True)
+            else:
+                _index = SymbolIndex.from_csv(FIXTURE_PATH)
+        return _index
+
+
+def lookup(symbol):
+    return get_index().lookup(symbol)
+
+
+@functools.lru_cache(maxsize=256)
+def _suggest(index, text):
+    return tuple(index.search(text, limit=SUGGESTIONS))
+
+
+def suggest(symbol, limit=SUGGESTIONS):
+    # Closest known symbols to an unknown one. The fuzzy part scans the
+    # whole index, so results are kept per input and shared by
+    # symbol_input and check_symbol.
+    return list(_suggest(get_index(), symbol.strip().upper())[:limit])
+
+
+def symbol_input(label, value="", container=st, key="symbol"):
+    # Ticker text input with completion from the index: while the entered
+    # text is not a known symbol, the closest symbols are offered below it,
+    # and picking one fills in the input. Returns the upper-cased symbol.
+    suggestion_key = f"{key}_suggestion"
+    if key not in st.session_state:
+        st.session_state[key] = value
+
+    def pick():
+        if st.session_state[suggestion_key]:
+            st.session_state[key] = st.session_state[suggestion_key]
+        st.session_state[suggestion_key] = None
+
+    symbol = container.text_input(label, key=key).strip().upper()
+    if symbol and lookup(symbol) is None:
+        matches = suggest(symbol)
+        if matches:
+            names = {match["symbol"]: match["name"] for match in matches}
+            container.pills(
+                "Suggestions", list(names), format_func=lambda match: f"{match} · {names[match]}",
+                key=suggestion_key, on_change=pick,
+            )
+    return symbol
+
+
+def check_symbol(symbol, container=st):
+    # Returns the index record for symbol. A plain US ticker missing from
+    # the full index is rejected (None, after showing suggestions in
+    # container) and never reaches the network. Otherwise the index cannot
+    # tell an unknown symbol from an unlisted one, so it only warns, and a
+    # stand-in record (assumed USD) is returned.
+    record = lookup(symbol)
+    if record is not None or not symbol.strip():
+        return record
+    suggestions = suggest(symbol, limit=5)
+    hint = ""
+    if suggestions:
+        hint = " Did you mean: " + ", ".join(
+            f"{match['symbol']} ({match['name']})" for match in suggestions
+        ) + "?"
+    if get_index().is_full and US_TICKER.fullmatch(symbol.strip().upper()):
+        container.error(f"Unknown symbol '{symbol}'.{hint}")
+        return None
+    container.warning(f"'{symbol}' is not in the local symbol index; fetching it anyway.{hint}")
+    return {"symbol": symbol.strip().upper(), "name": "", "exchange": "", "currency": "USD"}
+
+
+def download(path=FULL_PATH):
+    # Builds symbols_full.csv from the NASDAQ Trader symbol directory plus
+    # the checked-in fixture (which adds indices, FX, futures, crypto and
+    # non-US listings).
+    import requests
+
+    records = {}
+    for url, symbol_field, exchange_of in [
+        (NASDAQ_LISTED_URL, "Symbol", lambda row: "NASDAQ"),
+        (OTHER_LISTED_URL, "ACT Symbol", lambda row: OTHER_EXCHANGES.get(row["Exchange"], row["Exchange"])),
+    ]:
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        for row in csv.DictReader(io.StringIO(response.text), delimiter="|"):
+            symbol = row.get(symbol_field) or ""
+            if not symbol or symbol.startswith("File Creation Time") or row.get("Test Issue") == "Y":
+                continue
+            # Yahoo writes share classes with a dash (BRK.B -> BRK-B)
+            symbol = symbol.replace(".", "-").replace("$", "-P")
+            records[symbol] = {
+                "symbol": symbol,
+                "name": row["Security Name"].split(" - ")[0],
+                "exchange": exchange_of(row),
+                "currency": "USD",
+            }
+
+    with open(FIXTURE_PATH, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            records[row["symbol"]] = row
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for symbol in sorted(records):
+            writer.writerow({field: records[symbol][field] for field in FIELDS})
+    return len(records)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["download"]:
+        print(f"Wrote {download()} symbols to {FULL_PATH}")
+    else:
+        print("usage: python symbol_index.py download")